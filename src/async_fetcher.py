@@ -0,0 +1,275 @@
+import asyncio
+import base64
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+from urllib.parse import quote
+from github import GithubException, BadCredentialsException, RateLimitExceededException, UnknownObjectException
+import constants
+from graphql_fetcher import parse_timestamp
+from rate_limiter import RateLimitGovernor
+from paginator import get_last_page
+from pr_store import parse_page_cursor, to_page_cursor
+
+# aiohttp is optional, only needed with FETCH_ENGINE = "asyncio"
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def is_rate_limited(status: int, data, headers: Dict[str, str]) -> bool:
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    message = data.get("message", "") if isinstance(data, dict) else ""
+    return "Retry-After" in headers or headers.get("X-RateLimit-Remaining") == "0" or "rate limit" in message.lower()
+
+
+def to_github_exception(status: int, data, headers: Dict[str, str]) -> GithubException:
+    # The exceptions PyGithub raises, so that the callers handle both engines alike
+    if is_rate_limited(status, data, headers):
+        return RateLimitExceededException(status, data, headers)
+    if status == 401:
+        return BadCredentialsException(status, data, headers)
+    if status == 404:
+        return UnknownObjectException(status, data, headers)
+    return GithubException(status, data, headers)
+
+
+class AsyncGitHubClient:
+    """
+    The REST endpoints the pipeline uses, on aiohttp.
+
+    At most `max_in_flight` requests are sent at once. Server errors, timeouts and secondary rate limits
+    are retried after a jittered exponential backoff (or the wait GitHub asks for), and every request
+    is drawn from the budget of the rate limit governor, like the PyGithub calls.
+    """
+    def __init__(self, access_token: str, governor: RateLimitGovernor, max_in_flight: int = constants.ASYNC_REQUESTS_IN_FLIGHT, base_url: str = constants.GITHUB_API_URL):
+        if aiohttp is None:
+            raise ValueError("FETCH_ENGINE = \"asyncio\" requires the aiohttp package")
+        self.access_token = access_token
+        self.governor = governor
+        self.max_in_flight = max_in_flight
+        self.base_url = base_url.rstrip("/")
+        self.session = None
+        self.semaphore = None
+        # Listing pages requested ahead, keyed by (repo name, page number)
+        self.prefetched_pages = {}
+
+    async def open(self):
+        # Both belong to the event loop they are created in
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.session = aiohttp.ClientSession(
+            headers={
+                "Authorization": f"token {self.access_token}",
+                "Accept": "application/vnd.github+json",
+                "User-Agent": "acr-data-collection",
+            },
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+            timeout=aiohttp.ClientTimeout(total=constants.ASYNC_TIMEOUT_SECONDS),
+        )
+
+    async def close(self):
+        for task in self.prefetched_pages.values():
+            task.cancel()
+        await self.session.close()
+
+    def sync_budget(self, headers: Dict[str, str]):
+        # The search API has a budget of its own
+        if "X-RateLimit-Remaining" in headers and headers.get("X-RateLimit-Resource", "core") == "core":
+            self.governor.bucket.sync(int(headers["X-RateLimit-Remaining"]), float(headers["X-RateLimit-Reset"]))
+
+    async def wait_for_budget(self):
+        while not self.governor.bucket.try_acquire():
+            reset_time = max(self.governor.bucket.seconds_until_reset() + self.governor.reset_margin, 1)
+            print(f"Rate limit exceeded. Sleeping for {reset_time} seconds.")
+            await asyncio.sleep(reset_time)
+            # The window has reset; /rate_limit does not count against it and brings the new budget
+            await self.request("/rate_limit", acquire_budget=False)
+
+    def get_retry_delay(self, attempt: int, headers: Dict[str, str]) -> float:
+        if "Retry-After" in headers:
+            return float(headers["Retry-After"])
+        if headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in headers:
+            return max(float(headers["X-RateLimit-Reset"]) - time.time() + self.governor.reset_margin, 1)
+        # Full jitter, so that the requests that failed together are not retried together
+        return random.uniform(0, min(constants.ASYNC_MAX_BACKOFF_SECONDS, constants.ASYNC_BACKOFF_SECONDS * 2 ** attempt))
+
+    async def request(self, path: str, params: Dict = None, acquire_budget: bool = True) -> Tuple[Union[Dict, List, None], Dict[str, str]]:
+        """
+        GET an API path (or a full URL) and return the decoded JSON body with the response headers.
+        """
+        url = path if path.startswith("http") else self.base_url + path
+        for attempt in range(constants.ASYNC_RETRIES + 1):
+            last_attempt = attempt == constants.ASYNC_RETRIES
+            if acquire_budget:
+                await self.wait_for_budget()
+
+            async with self.semaphore:
+                try:
+                    async with self.session.get(url, params=params) as response:
+                        status = response.status
+                        # Kept case-insensitive, a proxy may send the header names in lowercase
+                        headers = response.headers.copy()
+                        text = await response.text()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if last_attempt:
+                        raise
+                    delay = self.get_retry_delay(attempt, {})
+                    print(f"Request to {url} failed ({e!r}), retrying in {delay:.1f} seconds")
+                    await asyncio.sleep(delay)
+                    continue
+
+            self.sync_budget(headers)
+            try:
+                data = json.loads(text) if text else None
+            except ValueError:
+                data = None
+            if status < 300:
+                return data, headers
+
+            if not last_attempt and (status >= 500 or is_rate_limited(status, data, headers)):
+                delay = self.get_retry_delay(attempt, headers)
+                print(f"Request to {url} answered {status}, retrying in {delay:.1f} seconds")
+                await asyncio.sleep(delay)
+                continue
+            raise to_github_exception(status, data, headers)
+
+    async def get_all_pages(self, path: str, params: Dict = None) -> List:
+        """
+        All the items of a paginated list. The first page gives the number of pages (Link header),
+        the others are then requested at once.
+        """
+        params = {**(params or {}), "per_page": constants.ASYNC_PAGE_SIZE}
+        items, headers = await self.request(path, params)
+        last_page = get_last_page(headers)
+        if last_page > 1:
+            pages = await asyncio.gather(*(self.request(path, {**params, "page": page}) for page in range(2, last_page + 1)))
+            for page_items, _ in pages:
+                items.extend(page_items)
+        return items
+
+    async def get_closed_pulls_page(self, repo_name: str, page_number: int, page_size: int) -> List[Dict]:
+        """
+        A page of closed PRs, most recently updated first (page numbers start at 0 like PaginatedList.get_page).
+        The next page is requested right away, the scan usually asks for it next.
+        """
+        task = self.prefetched_pages.pop((repo_name, page_number), None)
+        if task is None:
+            task = asyncio.ensure_future(self.request_closed_pulls_page(repo_name, page_number, page_size))
+        next_page = (repo_name, page_number + 1)
+        if next_page not in self.prefetched_pages:
+            self.prefetched_pages[next_page] = asyncio.ensure_future(self.request_closed_pulls_page(repo_name, page_number + 1, page_size))
+        return await task
+
+    async def request_closed_pulls_page(self, repo_name: str, page_number: int, page_size: int) -> List[Dict]:
+        params = {"state": "closed", "sort": "updated", "direction": "desc", "per_page": page_size, "page": page_number + 1}
+        pulls, _ = await self.request(f"/repos/{repo_name}/pulls", params)
+        return pulls
+
+    async def get_reviews(self, repo_name: str, pr_number: int) -> List[Dict]:
+        return await self.get_all_pages(f"/repos/{repo_name}/pulls/{pr_number}/reviews")
+
+    async def get_review_comments(self, repo_name: str, pr_number: int) -> List[Dict]:
+        """
+        The review comments of a PR as records (see github_helper.to_review_comment_record).
+        """
+        review_comments = await self.get_all_pages(f"/repos/{repo_name}/pulls/{pr_number}/comments")
+        return [
+            {
+                "body": review_comment["body"],
+                "position": review_comment.get("position"),
+                "line": review_comment.get("line"),
+                "original_line": review_comment.get("original_line"),
+                "side": review_comment.get("side"),
+                "file_name": review_comment["path"],
+                "commit_id": review_comment["commit_id"],
+                "original_commit_id": review_comment.get("original_commit_id"),
+            }
+            for review_comment in review_comments
+        ]
+
+    async def get_commit(self, repo_name: str, commit_sha: str) -> Dict:
+        """
+        A commit as {"sha", "message", "files"} (see local_diff.get_commit_diff). The files of large
+        commits are paginated like a list.
+        """
+        path = f"/repos/{repo_name}/commits/{commit_sha}"
+        params = {"per_page": constants.ASYNC_PAGE_SIZE}
+        commit, headers = await self.request(path, params)
+        files = list(commit["files"])
+        last_page = get_last_page(headers)
+        if last_page > 1:
+            pages = await asyncio.gather(*(self.request(path, {**params, "page": page}) for page in range(2, last_page + 1)))
+            for page, _ in pages:
+                files.extend(page["files"])
+
+        return {
+            "sha": commit["sha"],
+            "message": commit["commit"]["message"],
+            "files": [{"filename": file["filename"], "patch": file.get("patch")} for file in files],
+        }
+
+    async def get_file_content(self, repo_name: str, file_path: str, ref: str) -> str:
+        contents, _ = await self.request(f"/repos/{repo_name}/contents/{quote(file_path)}", {"ref": ref})
+        return base64.b64decode(contents["content"]).decode('utf-8')
+
+
+async def fetch_approved_PRs_page(client: AsyncGitHubClient, repo_name: str, cursor: Union[str, None], page_size: int):
+    """
+    github_helper.fetch_approved_PRs_page on the asyncio engine: the reviews of the PRs of the page are
+    requested at once. Returns the same records, and the same page cursors for the same page size.
+    """
+    page_number = parse_page_cursor(cursor, page_size)
+    pulls = await client.get_closed_pulls_page(repo_name, page_number, page_size)
+    print(f"Scanned page {page_number} of closed PRs")
+    reviews_per_pull = await asyncio.gather(*(client.get_reviews(repo_name, pull["number"]) for pull in pulls))
+
+    pr_records = []
+    for pull, reviews in zip(pulls, reviews_per_pull):
+        approved = any(review["state"] == "APPROVED" for review in reviews)
+        if approved:
+            print("Approved PR found: ", pull["number"])
+        pr_records.append({
+            "number": pull["number"],
+            "updated_at": parse_timestamp(pull["updated_at"]),
+            "title": pull["title"],
+            "base_repo": pull["base"]["repo"]["full_name"],
+            "head_sha": pull["head"]["sha"],
+            "approved": approved,
+            "review_comments": None,
+            "commits": None,
+        })
+
+    updated_ats = [pr_record["updated_at"] for pr_record in pr_records]
+    next_cursor = to_page_cursor(page_number + 1, page_size) if len(pulls) == page_size else None
+    return pr_records, min(updated_ats, default=None), max(updated_ats, default=None), next_cursor
+
+
+class AsyncFetchEngine:
+    """
+    Runs an AsyncGitHubClient on an event loop in a thread of its own, so that the (blocking) threads
+    of the pipeline can hand it coroutines: `submit` returns a concurrent.futures.Future, `run` waits for the result.
+    """
+    def __init__(self, client: AsyncGitHubClient):
+        self.client = client
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="async-fetch", daemon=True)
+        self.thread.start()
+        self.run(client.open())
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine):
+        return self.submit(coroutine).result()
+
+    def close(self):
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
@@ -0,0 +1,169 @@
+import bisect
+import threading
+from typing import Dict, Iterable, List, Union
+from diff_parser import Hunk
+
+
+class ReviewComment:
+    """
+    A review comment as the hunk stage needs it. PRs can have thousands of them, hence the slots.
+
+    `line` is a line of the file at `commit_id`, of the new file or, when `side` is "LEFT", of the old one.
+    An outdated comment has no `line` any more, only its `original_line` at `original_commit_id`: it is
+    anchored to that commit instead (anchor_commit_id, anchor_line).
+    """
+    __slots__ = ("body", "position", "line", "original_line", "side", "file_name", "commit_id", "original_commit_id", "anchor_commit_id", "anchor_line")
+
+    def __init__(self, body: str, position: Union[int, None], line: Union[int, None], original_line: Union[int, None], file_name: str, commit_id: str,
+                 side: Union[str, None] = None, original_commit_id: Union[str, None] = None):
+        self.body = body
+        self.position = position
+        self.line = line
+        self.original_line = original_line
+        self.side = side
+        self.file_name = file_name
+        self.commit_id = commit_id
+        self.original_commit_id = original_commit_id
+        if line is None and original_line is not None and original_commit_id is not None:
+            self.anchor_commit_id, self.anchor_line = original_commit_id, original_line
+        else:
+            self.anchor_commit_id, self.anchor_line = commit_id, line
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "ReviewComment":
+        # Records saved before line, original_line, side and original_commit_id were fetched do not have them
+        return cls(record["body"], record.get("position"), record.get("line"), record.get("original_line"), record["file_name"], record["commit_id"],
+                   record.get("side"), record.get("original_commit_id"))
+
+
+class CommentIndex:
+    """
+    The review comments of a PR by the commit they are anchored to and by file, each list sorted by line
+    (comments without a line last), so that a file's comments are found with two lookups.
+    """
+    def __init__(self, review_comments: Iterable[Dict]):
+        self.comments = {}
+        self.count = 0
+        for record in review_comments:
+            comment = ReviewComment.from_record(record)
+            self.comments.setdefault(comment.anchor_commit_id, {}).setdefault(comment.file_name, []).append(comment)
+            self.count += 1
+
+        for comments_by_file in self.comments.values():
+            for comments in comments_by_file.values():
+                comments.sort(key=lambda comment: (comment.anchor_line is None, comment.anchor_line or 0, comment.position or 0))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, commit_id: str) -> bool:
+        return commit_id in self.comments
+
+    def get_commit_ids(self) -> List[str]:
+        """
+        The commented commits, in the order of their first comment.
+        """
+        return [commit_id for commit_id in self.comments if commit_id is not None]
+
+    def get_comments(self, commit_id: str, file_name: str) -> List[ReviewComment]:
+        return self.comments.get(commit_id, {}).get(file_name, [])
+
+
+class FileHunkIndex:
+    """
+    The hunks of a file in a commit, sorted by new-file line, by old-file line and by diff position,
+    to find the hunk of a review comment with a binary search.
+
+    GitHub gives a comment's place as a line of the file at the commit (`line`, of the old file when its
+    `side` is "LEFT"), for outdated comments as a line of the file at the commit where the comment was made
+    (`original_line`, see ReviewComment), and as a deprecated position in the diff of the PR (`position`,
+    counted from the line after the first hunk header). The position only matches the patch of the commit
+    when the PR has a single commit, so it is only used for the records that have no line.
+    """
+    def __init__(self, hunks: List[Hunk]):
+        self.hunks = hunks
+        self.positions = [hunk.position for hunk in hunks]
+        self.last_positions = [hunk.position + len(hunk.lines) for hunk in hunks]
+        self.new_starts = [hunk.new_start for hunk in hunks]
+        self.old_starts = [hunk.old_start for hunk in hunks]
+        # Comments assigned to each hunk, computed once per file by assign_comments
+        self.assigned_comments = None
+        self.lock = threading.Lock()
+
+    def find_by_position(self, position: int) -> Union[int, None]:
+        """
+        Index of the hunk holding the diff position, None if no hunk does.
+        """
+        i = bisect.bisect_left(self.positions, position) - 1
+        if i >= 0 and position <= self.last_positions[i]:
+            return i
+        return None
+
+    def find_by_line(self, line: int) -> Union[int, None]:
+        """
+        Index of the hunk covering the new-file line, None if no hunk does.
+        """
+        i = bisect.bisect_right(self.new_starts, line) - 1
+        if i >= 0 and line <= self.hunks[i].new_end:
+            return i
+        return None
+
+    def find_by_old_line(self, line: int) -> Union[int, None]:
+        """
+        Index of the hunk covering the old-file line, None if no hunk does.
+        """
+        i = bisect.bisect_right(self.old_starts, line) - 1
+        if i >= 0 and line < self.hunks[i].old_start + self.hunks[i].old_length:
+            return i
+        return None
+
+    def get_new_line(self, hunk_number: int, position: int) -> Union[int, None]:
+        """
+        New-file line at a diff position of a hunk, None for a removed line.
+        """
+        hunk = self.hunks[hunk_number]
+        return hunk.new_line_numbers[position - hunk.position - 1]
+
+    def locate(self, comment: ReviewComment):
+        """
+        Return (hunk index, new-file line) of a review comment, from its line (None as the new-file line of
+        a "LEFT" comment), or from its diff position when it has no line. (None, None) when it is not in a hunk.
+        """
+        line = comment.anchor_line
+        if line is not None:
+            if comment.side == "LEFT":
+                return self.find_by_old_line(line), None
+            hunk_number = self.find_by_line(line)
+            return (hunk_number, line) if hunk_number is not None else (None, None)
+
+        position = comment.position
+        if position is not None:
+            hunk_number = self.find_by_position(position)
+            if hunk_number is not None:
+                return hunk_number, self.get_new_line(hunk_number, position)
+
+        return None, None
+
+    def assign_comments(self, comments: List[ReviewComment]) -> List[List[Dict]]:
+        """
+        Split the review comments of the file between its hunks. Comments outside the hunks are left out,
+        except those that have no line and no position at all: as before the comments were mapped, they go
+        to every hunk.
+        """
+        with self.lock:
+            if self.assigned_comments is not None:
+                return self.assigned_comments
+
+            assigned_comments = [[] for _ in self.hunks]
+            for comment in comments:
+                hunk_number, line = self.locate(comment)
+                if hunk_number is None:
+                    if comment.position is None and comment.line is None and comment.original_line is None:
+                        print("Review comment without line or position, added to every hunk")
+                        for hunk_comments in assigned_comments:
+                            hunk_comments.append({"comment": comment.body, "position": None, "line": None})
+                else:
+                    assigned_comments[hunk_number].append({"comment": comment.body, "position": comment.position, "line": line})
+
+            self.assigned_comments = assigned_comments
+            return assigned_comments
@@ -1,2 +1,60 @@
 ALLOWED_FILE_EXTENSIONS = [".go", ".cpp", ".c", ".py", ".js", ".java"]
-REPO_LIST_FILENAME = "../data/Projects.xlsx"
\ No newline at end of file
+EXTENSION_TO_LANGUAGE = {".py": "python", ".cpp": "cpp", ".c": "c", ".java": "java", ".js": "javascript", ".go": "golang"}
+REPO_LIST_FILENAME = "../data/Projects.xlsx"
+SYMBOL_INDEX_DIR = "../saved_objs/symbol_index"
+# Source files a symbol index keeps mapped to slice callee code from (each holds a file descriptor)
+SYMBOL_INDEX_OPEN_FILES = 64
+FILE_CONTEXT_CACHE_SIZE = 64
+PR_WORKER_COUNT = 4
+# Threads requesting the reviews of a page of closed PRs during the REST scan
+SCAN_WORKER_COUNT = 8
+HTTP_POOL_SIZE = 16
+# PyGithub waits this long between two requests by default (0.25s); the rate limit governor already paces them
+GITHUB_SECONDS_BETWEEN_REQUESTS = None
+# Items per page of the REST lists (at most 100)
+GITHUB_PAGE_SIZE = 100
+# Pages of a list requested at once once the first page has told how many there are
+PAGE_PREFETCH_WORKERS = 8
+# GET responses of the API kept between runs and revalidated with their ETag, None to turn the cache off
+HTTP_CACHE_DIR = "../saved_objs/http_cache"
+# Core API requests kept in reserve before waiting for the rate limit to reset
+RATE_LIMIT_RESERVE = 100
+# Seconds between two rate limit requests; in between the budget is read from the response headers
+RATE_LIMIT_REFRESH_SECONDS = 300
+RATE_LIMIT_RESET_MARGIN_SECONDS = 2
+RATE_LIMIT_RETRIES = 3
+# "graphql" fetches the approved PRs with their review comments and commits in bulk, "rest" uses PyGithub only
+PR_FETCH_BACKEND = "graphql"
+# Where the API requests are sent; point it at a github_replay.py server to record or replay a run
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_GRAPHQL_URL = f"{GITHUB_API_URL}/graphql"
+# API that github_replay.py forwards to when recording, and whose URLs it rewrites in the responses
+GITHUB_UPSTREAM_URL = "https://api.github.com"
+CASSETTE_PATH = "../saved_objs/cassettes/github.sqlite"
+GRAPHQL_PR_PAGE_SIZE = 50
+GRAPHQL_TIMEOUT_SECONDS = 60
+# "threads" makes the REST calls with PyGithub from PR_WORKER_COUNT threads. "asyncio" sends the review comment,
+# commit and file content requests (and the PR scan with PR_FETCH_BACKEND = "rest") through async_fetcher (needs aiohttp)
+FETCH_ENGINE = "threads"
+ASYNC_REQUESTS_IN_FLIGHT = 100
+# PRs fetched ahead of the pipeline by the asyncio engine
+ASYNC_PRS_IN_FLIGHT = 200
+ASYNC_PAGE_SIZE = 100
+ASYNC_RETRIES = 5
+# Base of the exponential backoff between retries, jittered
+ASYNC_BACKOFF_SECONDS = 1
+ASYNC_MAX_BACKOFF_SECONDS = 60
+ASYNC_TIMEOUT_SECONDS = 60
+# Compression of the dataset files: None, "gzip" or "zstd" (needs the zstandard package)
+DATASET_COMPRESSION = None
+# Items that can wait between two stages of the dataset pipeline
+PIPELINE_QUEUE_SIZE = 64
+# Each repository is cloned into its own directory under REPOSITORIES_DIR
+REPOSITORIES_DIR = "../repositories"
+DATASET_DIR = "../data/diffs_per_repo"
+# Repositories processed at the same time by main.py, each in its own process
+REPO_WORKER_COUNT = 2
+# Partial bare clones kept between runs, one per repository
+REPO_CACHE_DIR = "../saved_objs/repo_cache"
+# {repo_name} is replaced by the owner/name of the repository
+GIT_REMOTE_URL = "https://github.com/{repo_name}.git"
@@ -0,0 +1,76 @@
+import os
+import io
+import json
+import gzip
+from typing import Dict, Union
+
+# zstandard is optional, only needed for zstd-compressed output
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_EXTENSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def get_dataset_file_path(base_path: str, compression: Union[str, None]) -> str:
+    """
+    Path of the JSONL file for `base_path` (without extension) and the given compression.
+    """
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unsupported compression: {compression}")
+    return f"{base_path}.jsonl{COMPRESSION_EXTENSIONS[compression]}"
+
+
+def open_text_stream(path: str, compression: Union[str, None]):
+    if compression is None:
+        return open(path, 'w', encoding='utf-8')
+    if compression == "gzip":
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(path, 'wb')), encoding='utf-8')
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+class JSONLWriter:
+    """
+    Writes records one per line as they are produced, so they never have to be held in memory.
+
+    The records go to `<file_path>.partial`, which is renamed to `file_path` once the writer is
+    closed. An interrupted run leaves the previous file (if any) untouched.
+    """
+    def __init__(self, file_path: str, compression: Union[str, None] = None):
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file_path = file_path
+        self.partial_path = file_path + ".partial"
+        self.stream = open_text_stream(self.partial_path, compression)
+        self.count = 0
+
+    def write(self, record: Dict):
+        self.stream.write(json.dumps(record) + "\n")
+        self.count += 1
+
+    def close(self):
+        """
+        Flush the records and move the file in place.
+        """
+        self.stream.close()
+        os.replace(self.partial_path, self.file_path)
+        print(f"{self.count} records successfully written to {self.file_path}")
+
+    def discard(self):
+        self.stream.close()
+        os.remove(self.partial_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
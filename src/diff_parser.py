@@ -0,0 +1,177 @@
+import re
+from typing import Iterator, List, Union
+
+# Hunk header; a missing length means a length of 1 ("@@ -5 +5 @@")
+HUNK_HEADER_PATTERN = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+# Lines where a hunk starts or the diff of the next file starts. Hunk lines start with
+# " ", "+", "-" or "\", so they never match.
+BOUNDARY_PATTERN = re.compile(r'^(?:(@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@)(.*)|diff --git .*)$', re.MULTILINE)
+
+# Marker that follows the last line of a file without a newline at the end
+NO_NEWLINE_MARKER = "\\"
+
+
+class Hunk:
+    """
+    A hunk of a unified diff.
+
+    - old_start, old_length, new_start, new_length: the ranges of the header.
+    - header: the "@@ -a,b +c,d @@" part of the header line, section: the text after it (often the enclosing function).
+    - body: the lines of the hunk as they appear in the patch, "\\ No newline" markers included.
+    - position: position of the header line in the patch of the file (0 for the first hunk). GitHub counts
+      review comment positions from the line after the first header, so the n-th line of the hunk has
+      position `position + n` (n starting at 1).
+
+    The line numbers (added_lines, removed_lines, context_lines, new_line_numbers) are only computed when used.
+    """
+    # Large patches have many hunks
+    __slots__ = ("old_start", "old_length", "new_start", "new_length", "header", "section", "position", "body", "_line_numbers")
+
+    def __init__(self, old_start: int, old_length: int, new_start: int, new_length: int, header: str, section: str, position: int, body: str = ""):
+        self.old_start = old_start
+        self.old_length = old_length
+        self.new_start = new_start
+        self.new_length = new_length
+        self.header = header
+        self.section = section
+        self.position = position
+        self.body = body
+        self._line_numbers = None
+
+    @property
+    def new_end(self) -> int:
+        """
+        New-file line number of the last line of the hunk (new_start - 1 when the hunk only removes lines).
+        """
+        return self.new_start + self.new_length - 1
+
+    @property
+    def content(self) -> str:
+        """
+        The text of the hunk after the "@@ ... @@" header, as returned by extract_code_diffs.
+        """
+        return (self.section + "\n" + self.body).strip()
+
+    @property
+    def lines(self) -> List[str]:
+        return self.body.split("\n") if self.body else []
+
+    def get_line_numbers(self):
+        """
+        Number the lines of the hunk. Returns (added, removed, context, new_line_numbers): the new-file line
+        numbers of the added and unchanged lines, the old-file line numbers of the removed lines, and the
+        new-file line number of every line of the hunk (None for removed lines and markers).
+        """
+        if self._line_numbers is not None:
+            return self._line_numbers
+
+        added, removed, context, new_line_numbers = [], [], [], []
+        old_line = self.old_start
+        new_line = self.new_start
+        for line in self.lines:
+            kind = line[:1]
+            if kind == "+":
+                added.append(new_line)
+                new_line_numbers.append(new_line)
+                new_line += 1
+            elif kind == "-":
+                removed.append(old_line)
+                new_line_numbers.append(None)
+                old_line += 1
+            elif kind == NO_NEWLINE_MARKER:
+                new_line_numbers.append(None)
+            else:
+                # Context line; some tools strip the space of empty context lines
+                context.append(new_line)
+                new_line_numbers.append(new_line)
+                old_line += 1
+                new_line += 1
+
+        self._line_numbers = (added, removed, context, new_line_numbers)
+        return self._line_numbers
+
+    @property
+    def added_lines(self) -> List[int]:
+        return self.get_line_numbers()[0]
+
+    @property
+    def removed_lines(self) -> List[int]:
+        return self.get_line_numbers()[1]
+
+    @property
+    def context_lines(self) -> List[int]:
+        return self.get_line_numbers()[2]
+
+    @property
+    def new_line_numbers(self) -> List[Union[int, None]]:
+        return self.get_line_numbers()[3]
+
+
+def parse_hunk_header(line: str, position: int = 0) -> Union[Hunk, None]:
+    match = HUNK_HEADER_PATTERN.match(line)
+    if not match:
+        return None
+
+    old_start, old_length, new_start, new_length = match.groups()
+    return Hunk(
+        int(old_start),
+        int(old_length) if old_length is not None else 1,
+        int(new_start),
+        int(new_length) if new_length is not None else 1,
+        match.group(0),
+        line[match.end():],
+        position,
+    )
+
+
+def iter_hunks(patch: str) -> Iterator[Hunk]:
+    """
+    Parse the hunks of a unified diff in a single pass that only stops at the header lines.
+
+    `patch` is the patch of a file (as in a GitHub commit) or a whole `git diff` output; anything that is
+    not part of a hunk (file headers) is skipped. Positions are counted per file from its first hunk header.
+    """
+    hunk = None
+    hunk_body_start = 0
+    # Where the positions were last counted up to, None before the first hunk of a file
+    position_offset = None
+    position = 0
+
+    for match in BOUNDARY_PATTERN.finditer(patch):
+        if hunk is not None:
+            # The hunk ends at the line before this boundary
+            hunk.body = patch[hunk_body_start:match.start() - 1]
+            yield hunk
+            hunk = None
+
+        header, old_start, old_length, new_start, new_length, section = match.groups()
+        if header is None:
+            # Next file of a multi-file diff, its positions start again
+            position_offset = None
+            continue
+
+        if position_offset is None:
+            position = 0
+        else:
+            position += patch.count("\n", position_offset, match.start())
+        position_offset = match.start()
+
+        hunk = Hunk(
+            int(old_start),
+            int(old_length) if old_length is not None else 1,
+            int(new_start),
+            int(new_length) if new_length is not None else 1,
+            header,
+            section,
+            position,
+        )
+        hunk_body_start = match.end() + 1
+
+    if hunk is not None:
+        hunk.body = patch[hunk_body_start:].rstrip("\n")
+        yield hunk
+
+
+def parse_hunks(patch: str) -> List[Hunk]:
+    return list(iter_hunks(patch))
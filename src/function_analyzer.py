@@ -1,74 +1,51 @@
-import ast
 import re
 import os
-from typing import Dict, List, Set
-from user_defined_functions import *
+from typing import Dict, Set, Tuple
+from helper import detect_lang_from_extension
+from language_parser import CALL_QUERY_MAP, get_parser
+from symbol_index import get_symbol_index
 
-def load_user_defined_functions(file_path: str) -> Set[str]:
+def strip_diff_markers(code_diff: str) -> str:
     """
-    Load the list of user-defined functions from a text file.
+    Turn a unified diff hunk back into source code by dropping the hunk headers and the
+    leading '+', '-' or ' ' of every line, so that it can be parsed.
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return {line.strip() for line in file if line.strip()}
+    code_lines = []
+    for line in code_diff.split('\n'):
+        if line.startswith('@@') or line.startswith('\\'):
+            continue
+        code_lines.append(line[1:] if line[:1] in ('+', '-', ' ') else line)
+    return '\n'.join(code_lines)
 
-def extract_function_calls(code: str) -> Set[str]:
+def extract_function_calls(code: str, language: str = "python") -> Tuple[Set[str], Dict[str, Set[str]]]:
     """
-    Extract function calls from a Python code string using AST.
+    Extract the names of the functions called in a code diff using the tree-sitter call query of its language.
+    Returns the names called as plain functions, and the names only called on a receiver (obj.f(), pkg.f())
+    with the receivers captured by the query (@receiver, the Go operands).
     """
     function_calls = set()
-    
-    try:
-        tree = ast.parse(code)
-        
-        class FunctionCallVisitor(ast.NodeVisitor):
-            def visit_Call(self, node):
-                if isinstance(node.func, ast.Name):
-                    function_calls.add(node.func.id)
-                elif isinstance(node.func, ast.Attribute):
-                    function_calls.add(f"{node.func.value.id}.{node.func.attr}")
-                self.generic_visit(node)
-                
-        FunctionCallVisitor().visit(tree)
-    except:
-        # If AST parsing fails, try regex-based approach
+    method_calls = {}
+    call_query = CALL_QUERY_MAP.get(language)
+
+    if call_query is None:
+        # Unsupported language, fall back to a regex-based approach
         function_pattern = r'\b\w+\s*\('
         matches = re.finditer(function_pattern, code)
         for match in matches:
             func_name = match.group().strip('(').strip()
             function_calls.add(func_name)
-    
-    return function_calls
+        return function_calls, method_calls
 
-def get_function_code_pattern(function_name):
-    # Regex pattern to capture the function definition and body
-    return re.compile(rf"(def {function_name}\s*\(.*?\):\s*\n(?:\s+.*\n)*)", re.MULTILINE)
+    tree = get_parser(language).parse(bytes(strip_diff_markers(code), "utf8"))
+    for _, captures in call_query.matches(tree.root_node):
+        if "method" in captures:
+            receivers = method_calls.setdefault(captures["method"].text.decode('utf-8', errors='replace'), set())
+            if "receiver" in captures:
+                receivers.add(captures["receiver"].text.decode('utf-8', errors='replace'))
+        else:
+            function_calls.add(captures["call"].text.decode('utf-8', errors='replace'))
 
-def extract_function_code_from_repo(repo_path: str, function_name: str) -> List[Dict[str, str]]:
-    """
-    Extracts the function code for the specified function name across the repository.
-    """
-    function_code_data = []
-    
-    # Walk through all files in the repo_path
-    for root, dirs, files in os.walk(repo_path):
-        # Exclude 'lib' and 'static' directories
-        if 'lib' in root.split(os.sep) or 'static' in root.split(os.sep):
-            continue
-        
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
-            
-            # Only check .py files (skip __init__ files)
-            if file_path.endswith('.py') and 'init' not in file_name:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
-                    # Search and extract the function code in the file
-                    match = get_function_code_pattern(function_name).search(content)
-                    if match:
-                        function_code_data.append({
-                            "code": match.group(1)
-                        })
-    return function_code_data
+    return function_calls, {name: receivers for name, receivers in method_calls.items() if name not in function_calls}
 
 def analyze_diff_and_functions(diff_data: Dict, repo_path) -> Dict:
     """
@@ -79,27 +56,31 @@ def analyze_diff_and_functions(diff_data: Dict, repo_path) -> Dict:
         'extracted_code': {}
     }
     
-    output_file = "user_defined_functions.txt"
-    find_user_defined_functions(repo_path, output_file)
-
-    # Get the directory of the current script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    user_defined_functions_file = os.path.join(script_dir, output_file)
-
-    # Read the file and store each line in a list
-    with open(user_defined_functions_file, 'r') as file:
-        user_defined_functions = [line.strip() for line in file]
+    # Built once per commit of the repo and then served from memory
+    symbol_index = get_symbol_index(repo_path)
     
     # Extract function calls from the diff
-    diff_functions = extract_function_calls(diff_data['code_diff'])
+    language = detect_lang_from_extension(diff_data['file_name'])
+    diff_functions, diff_methods = extract_function_calls(diff_data['code_diff'], language)
 
-    # Filter to include only functions with at least one underscore and are in the user-defined functions list
-    filtered_functions = {func for func in diff_functions if func in user_defined_functions}
+    # Filter to include only the functions defined in the repo in the language of the diff. Python names
+    # are already filtered by the index; in the other languages every named function is indexed, so a
+    # method called on a receiver (list.get(), sb.append()) is only looked up in the package of the diff,
+    # and in Go in the packages of the repo the receiver names (utils.Parse()).
+    method_directory = None if language == "python" else os.path.dirname(diff_data['file_name'])
+    package_directories = symbol_index.get_go_package_directories(diff_data['file_name']) if language == "golang" else {}
+    filtered_functions = {func: None for func in diff_functions if symbol_index.has_definition(func, language)}
+    for func, receivers in diff_methods.items():
+        directories = [package_directories[receiver] for receiver in sorted(receivers) if receiver in package_directories]
+        for directory in directories + [method_directory]:
+            if symbol_index.has_definition(func, language, directory):
+                filtered_functions[func] = directory
+                break
     result['function_calls'] = list(filtered_functions)
 
-    for function_name in filtered_functions:
+    for function_name, directory in filtered_functions.items():
         print("Processing function:", function_name)
-        function_code = extract_function_code_from_repo(repo_path, function_name)
+        function_code = symbol_index.get_function_code(function_name, language, directory)
         if function_code:
             result['extracted_code'][function_name] = function_code
 
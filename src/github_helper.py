@@ -1,21 +1,47 @@
-from github import Github, GithubException, BadCredentialsException, PullRequest, PaginatedList, PullRequestComment, Commit, PullRequestComment, Repository
+from github import Github, GithubException, BadCredentialsException, RateLimitExceededException, UnknownObjectException, PullRequest, PullRequestComment, PullRequestReview, PullRequestComment, Repository
 # Authentication is defined via github.Auth
 from github import Auth
-from helper import extract_code_diffs, get_code_diff_start_line, has_allowed_extensions, extract_function_from_full_content, detect_lang_from_extension
+from helper import has_allowed_extensions, detect_lang_from_extension, FileFunctionContext
 import constants
 import os
 from dotenv import load_dotenv
-import pickle
-from typing import List
+from typing import Iterator, List, Sequence, Union
 from logger import logger
-import time
 import git
+from gitdb.exc import BadName, BadObject
+from collections import OrderedDict, deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import asyncio
+from rate_limiter import RateLimitGovernor, SharedTokenBucket
+from github_transport import install_pooled_connections
+from async_fetcher import AsyncGitHubClient, AsyncFetchEngine, fetch_approved_PRs_page as fetch_approved_PRs_page_async
+from graphql_fetcher import fetch_pr_records_page
+from pr_store import ApprovedPRStore, scan_approved_PRs, parse_page_cursor, to_page_cursor
+from paginator import iter_paginated, MAX_PAGE_SIZE
+from repo_cache import update_repo_cache, checkout_worktree, fetch_pull_request_refs
+from local_diff import get_commit_diff
+from diff_parser import parse_hunks
+from comment_mapping import CommentIndex, FileHunkIndex
 
 auth = None
 user = None
+access_token = None
+# Clone of the repository being processed, used to read files without the API
+local_repo_path = None
+# git.Repo of the clone opened by each thread
+local_repos = threading.local()
+# Parsed files keyed by (repo name, commit sha, file path), least recently used first
+file_context_cache = OrderedDict()
+file_context_lock = threading.Lock()
+# Core API requests left, shared by the threads processing PRs
+rate_limit_governor = RateLimitGovernor(constants.RATE_LIMIT_RESERVE, constants.RATE_LIMIT_REFRESH_SECONDS, constants.RATE_LIMIT_RESET_MARGIN_SECONDS)
+# AsyncFetchEngine making the REST calls when FETCH_ENGINE is "asyncio", started for each repository by main.run_repo
+fetch_engine = None
 
 def authenticate_github():
-    global user, auth
+    global user, auth, access_token
     try:
         # Load environment variables from .env file
         load_dotenv()
@@ -23,8 +49,10 @@ def authenticate_github():
         if not access_token:
             raise ValueError("GitHub access token not found. Please set GITHUB_ACCESS_TOKEN in the environment.")
 
-        # Authenticate using the access token
-        auth = Github(access_token)
+        # Authenticate using the access token. The pooled connections let the PR workers share the client,
+        # and answer the requests made by earlier runs from the response cache when GitHub replies 304.
+        install_pooled_connections(constants.HTTP_CACHE_DIR)
+        auth = Github(access_token, base_url=constants.GITHUB_API_URL, pool_size=constants.HTTP_POOL_SIZE, seconds_between_requests=constants.GITHUB_SECONDS_BETWEEN_REQUESTS, per_page=min(constants.GITHUB_PAGE_SIZE, MAX_PAGE_SIZE))
         user = auth.get_user()  # Test if the token is valid
         print(f"Authenticated as: {user.login}")
         
@@ -38,126 +66,340 @@ def authenticate_github():
         print(f"An unexpected error occurred: {str(e)}")
 
 
+def start_fetch_engine():
+    """
+    Start the asyncio engine when FETCH_ENGINE is "asyncio" (and it is not running yet).
+    """
+    global fetch_engine
+    if constants.FETCH_ENGINE == "asyncio" and fetch_engine is None:
+        fetch_engine = AsyncFetchEngine(AsyncGitHubClient(access_token, rate_limit_governor, base_url=constants.GITHUB_API_URL))
+
+
+def close_fetch_engine():
+    """
+    Close the aiohttp session of the asyncio engine and stop its event loop, if it was started.
+    """
+    global fetch_engine
+    if fetch_engine is not None:
+        fetch_engine.close()
+        fetch_engine = None
+
+
 def fetch_approved_PRs_from_repo(repo_name: str):
-    if auth:
-        repo = auth.get_repo(repo_name)
-    else:
+    if not auth:
         print("auth is None")
         return None
-    
+
+    # PR records are saved as they are scanned; a later run resumes an interrupted scan
+    # or only scans the PRs updated since the last one.
+    store = ApprovedPRStore(f"../saved_objs/{repo_name}/approved_pr_records_{constants.PR_FETCH_BACKEND}.sqlite")
+    executor = None
     try:
-        with open(f"../saved_objs/{repo_name}/approved_prs.pkl", 'rb') as f:
-            approved_prs = pickle.load(f)
-            print("Loaded approved PRs from file.")
-            return approved_prs
-    except FileNotFoundError as fe:
-        print("Approved PRs pickle not found: ", str(fe))
-        approved_prs = []
+        if constants.PR_FETCH_BACKEND == "graphql":
+            fetch_page = lambda cursor: fetch_pr_records_page(access_token, repo_name, cursor)
+        elif fetch_engine is not None:
+            # Same pages as PyGithub, so that both engines can resume the scans of the other
+            fetch_page = lambda cursor: fetch_engine.run(fetch_approved_PRs_page_async(fetch_engine.client, get_repo(repo_name).full_name, cursor, auth.per_page))
+        else:
+            repo = get_repo(repo_name)
+            # Makes the review requests of a page and requests the next page, pages requested ahead by page number
+            executor = ThreadPoolExecutor(max_workers=constants.SCAN_WORKER_COUNT)
+            prefetched_pages = {}
+            fetch_page = lambda cursor: fetch_approved_PRs_page(repo, cursor, executor, prefetched_pages)
+        # A page that hits a secondary rate limit is requested again once it is waited out, the scan goes on
+        approved_prs = scan_approved_PRs(store, lambda cursor: call_with_rate_limit_retries(fetch_page, cursor))
+    finally:
+        if executor is not None:
+            # A page requested ahead of the end of the scan is cancelled if not started yet, a running request is waited for
+            executor.shutdown(wait=True, cancel_futures=True)
+        store.close()
+
+    print(f"Approved PRs in the repo: {len(approved_prs)}")
+    return approved_prs
+
 
+def fetch_approved_PRs_page(repo: Repository.Repository, cursor: Union[str, None], executor: ThreadPoolExecutor, prefetched_pages: dict):
+    """
+    REST counterpart of graphql_fetcher.fetch_pr_records_page, the cursor is a page cursor (see pr_store.to_page_cursor).
+    The review comments and commits are left out of the records and fetched when the PR is processed.
+
+    The reviews of the PRs of the page are requested by the threads of `executor` at once, and the next page
+    is requested right away (kept in `prefetched_pages`), the scan usually asks for it next.
+    """
+    page_number = parse_page_cursor(cursor, auth.per_page)
+    future = prefetched_pages.pop(page_number, None)
+    if future is None:
+        future = executor.submit(get_closed_pulls_page, repo, page_number)
+    pulls = future.result()
+    print(f"Scanned page {page_number} of closed PRs")
+    if len(pulls) == auth.per_page:
+        prefetched_pages[page_number + 1] = executor.submit(get_closed_pulls_page, repo, page_number + 1)
+
+    pr_records = []
+    for pr, approved in zip(pulls, executor.map(lambda pr: is_PR_approved(repo, pr), pulls)):
+        if approved:
+            print("Approved PR found: ", pr.number)
+        pr_records.append({
+            "number": pr.number,
+            "updated_at": pr.updated_at.timestamp(),
+            "title": pr.title,
+            "base_repo": repo.full_name,
+            "head_sha": pr.head.sha,
+            "approved": approved,
+            "review_comments": None,
+            "commits": None,
+        })
+
+    updated_ats = [pr_record["updated_at"] for pr_record in pr_records]
+    next_cursor = to_page_cursor(page_number + 1, auth.per_page) if len(pulls) == auth.per_page else None
+    return pr_records, min(updated_ats, default=None), max(updated_ats, default=None), next_cursor
+
+
+def get_closed_pulls_page(repo: Repository.Repository, page_number: int) -> list:
     monitor_rate_limit()
-    pulls = repo.get_pulls(state='closed')  # Only closed PRs can be approved
-    approved_prs = []
-    print("No. of closed PRs in the repo: ", pulls.totalCount)
-
-    for pr in pulls:
-        monitor_rate_limit()
-        reviews = pr.get_reviews()
-        if reviews.totalCount > 0:
-            for review in reviews:
-                if review.state == "APPROVED":
-                    approved_prs.append(pr)
-                    print("Approved PR found: ", len(approved_prs))
-                    break
-
-    os.makedirs(f"../saved_objs/{repo_name}", exist_ok=True)
-    with open(f"../saved_objs/{repo_name}/approved_prs.pkl", 'wb') as f:
-        pickle.dump(approved_prs, f)
-        print("Saved approved PRs to file.")            
+    # Only closed PRs can be approved
+    return repo.get_pulls(state='closed', sort='updated', direction='desc').get_page(page_number)
 
-    return approved_prs
 
+def is_PR_approved(repo: Repository.Repository, pr: PullRequest.PullRequest) -> bool:
+    reviews = iter_paginated(repo._requester, PullRequestReview.PullRequestReview, f"{pr.url}/reviews", before_request=monitor_rate_limit)
+    return any(review.state == "APPROVED" for review in reviews)
 
-def is_comment_in_code_diff(code_diff_file, comment_file, code_diff_start_line, comment_position, code_diff_end_line):
-    if code_diff_file != comment_file:
-        return False
-    if None in (code_diff_start_line, comment_position, code_diff_end_line):
-        print("None found in is_comment_in_code_diff", code_diff_start_line, comment_position, code_diff_end_line)
-        if comment_position is None:
-            return True
-        return False
 
-    return code_diff_start_line <= comment_position <= code_diff_end_line
+@lru_cache(maxsize=None)
+def get_repo(repo_name: str) -> Repository.Repository:
+    monitor_rate_limit()
+    return auth.get_repo(repo_name)
 
 
-def get_commits_by_ids(commits: PaginatedList.PaginatedList[Commit.Commit], commit_ids: List[str]) -> List[Commit.Commit]:
-    filtered_commits = []
-    for commit in commits:
-        if commit.sha in commit_ids:
-            filtered_commits.append(commit)
+def iter_fetched_PRs(approved_prs: Sequence[dict], max_workers: int = constants.PR_WORKER_COUNT) -> Iterator[dict]:
+    """
+    Yield the commented commits of the approved PRs (see fetch_PR_commits), in PR order, skipping PRs without review comments.
+    With more than one worker the PRs are fetched concurrently, at most `2 * max_workers`
+    of them ahead of the consumer so that fetched PRs do not pile up in memory.
+    """
+    for pr_commits in iter_fetch_results(approved_prs, max_workers):
+        if pr_commits is not None:
+            yield pr_commits
+
+def iter_fetch_results(approved_prs: Sequence[dict], max_workers: int):
+    approved_prs_count = len(approved_prs)
+
+    if fetch_engine is not None:
+        # The requests of up to ASYNC_PRS_IN_FLIGHT PRs are made at once by the event loop
+        pending = deque()
+        for i, pr_record in enumerate(approved_prs, start=1):
+            pending.append(fetch_engine.submit(fetch_PR_commits_async(pr_record, i, approved_prs_count)))
+            if len(pending) >= constants.ASYNC_PRS_IN_FLIGHT:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+        return
+
+    if max_workers <= 1:
+        for i, pr_record in enumerate(approved_prs, start=1):
+            yield call_with_rate_limit_retries(fetch_PR_commits, pr_record, i, approved_prs_count)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for i, pr_record in enumerate(approved_prs, start=1):
+            pending.append(executor.submit(call_with_rate_limit_retries, fetch_PR_commits, pr_record, i, approved_prs_count))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def call_with_rate_limit_retries(func, *args):
+    # Rate limit errors that GithubRetry gave up on are waited out and the call is made again
+    for attempt in range(constants.RATE_LIMIT_RETRIES + 1):
+        try:
+            return func(*args)
+        except RateLimitExceededException as e:
+            if attempt == constants.RATE_LIMIT_RETRIES:
+                raise
+            rate_limit_governor.back_off(e)
+
+def fetch_PR_commits(pr_record: dict, i: int, approved_prs_count: int) -> Union[dict, None]:
+    """
+    Fetch the commits of a PR that have review comments, with their files and patches (from the local clone when it has them).
+    Whatever the PR record lacks is fetched with the REST API. Returns None when the PR has no review comments.
+    """
+    repo = get_repo(pr_record["base_repo"])
+    pr_title = pr_record["title"]
+    pr_number = pr_record["number"]
+    print(f"\n\nProcessing PR ({i}/{approved_prs_count}): {pr_title}")
+
+    review_comments = pr_record["review_comments"]
+    if review_comments is None:
+        # Only the review comments are requested, not the PR itself
+        pr_review_comments = iter_paginated(repo._requester, PullRequestComment.PullRequestComment, f"{repo.url}/pulls/{pr_number}/comments", before_request=monitor_rate_limit)
+        review_comments = [to_review_comment_record(review_comment) for review_comment in pr_review_comments]
+
+    # Skip if there are no review comments
+    if not review_comments:
+        return None
 
-    return filtered_commits
+    # The review comments by the commit they were made at and by file
+    comment_index = CommentIndex(review_comments)
 
+    # The record has no patches, the changes of the commented commits are computed one by one
+    commit_diffs = (get_commit_diff_of(repo, commit_sha) for commit_sha in get_commented_shas(pr_record, comment_index))
+    commits_with_review_comments = [commit_diff for commit_diff in commit_diffs if commit_diff is not None]
 
-def collect_diffs_comments_and_commits(approved_prs: List[PullRequest.PullRequest]):
-    diffs_and_comments = []
-    i, approved_prs_count = 0, len(approved_prs)
+    return {
+        "repo": repo,
+        "pr_title": pr_title,
+        "pr_number": pr_number,
+        "comment_index": comment_index,
+        "commits": commits_with_review_comments,
+    }
+
+async def fetch_PR_commits_async(pr_record: dict, i: int, approved_prs_count: int) -> Union[dict, None]:
+    """
+    fetch_PR_commits on the asyncio engine: the review comments and the commits missing from the local clone
+    are requested together with those of the other PRs in flight.
+    """
+    repo = await asyncio.to_thread(get_repo, pr_record["base_repo"])
+    pr_title = pr_record["title"]
+    pr_number = pr_record["number"]
+    print(f"\n\nProcessing PR ({i}/{approved_prs_count}): {pr_title}")
+
+    review_comments = pr_record["review_comments"]
+    if review_comments is None:
+        review_comments = await fetch_engine.client.get_review_comments(repo.full_name, pr_number)
+
+    if not review_comments:
+        return None
+
+    comment_index = CommentIndex(review_comments)
+    commits_with_review_comments = await asyncio.gather(*(get_commit_diff_async(repo, commit_sha) for commit_sha in get_commented_shas(pr_record, comment_index)))
+
+    return {
+        "repo": repo,
+        "pr_title": pr_title,
+        "pr_number": pr_number,
+        "comment_index": comment_index,
+        "commits": [commit_diff for commit_diff in commits_with_review_comments if commit_diff is not None],
+    }
+
+def get_commented_shas(pr_record: dict, comment_index: CommentIndex) -> List[str]:
+    """
+    Only the commented commits are needed. When the record has the commits of the PR, the comments made on
+    commits that are no longer part of it are left out; otherwise the commented commits are looked up
+    by sha, without listing the commits of the PR.
+    """
+    commented_shas = comment_index.get_commit_ids()
+    if pr_record["commits"] is not None:
+        pr_shas = {commit["sha"] for commit in pr_record["commits"]}
+        commented_shas = [commit_sha for commit_sha in commented_shas if commit_sha in pr_shas]
+    return commented_shas
+
+def to_review_comment_record(review_comment: PullRequestComment.PullRequestComment) -> dict:
+    return {
+        "body": review_comment.body,
+        "position": review_comment.position,
+        # Not all exposed by PyGithub yet. raw_data (or an attribute missing from the listing) would request
+        # the comment again, the listing already has them.
+        "line": review_comment._rawData.get("line"),
+        "original_line": review_comment._rawData.get("original_line"),
+        "side": review_comment._rawData.get("side"),
+        "file_name": review_comment.path,
+        "commit_id": review_comment.commit_id,
+        "original_commit_id": review_comment._rawData.get("original_commit_id"),
+    }
 
-    for pr in approved_prs:
-        # monitor_rate_limit()
-        i += 1
-        repo = pr.base.repo
-        pr_title = pr.title
-        pr_number = pr.number
-        # A dictionary that maps commits to the review comments made at that point.
-        commit_to_review_comment = {}
-        print(f"\n\nProcessing PR ({i}/{approved_prs_count}): {pr_title}")
+def get_commit_diff_of(repo: Repository.Repository, commit_sha: str) -> Union[dict, None]:
+    """
+    The changes of a commit (see local_diff.get_commit_diff), computed from the local clone.
+    The commit is only fetched with the API when the clone does not have it; its patches may then be truncated.
+    Returns None when GitHub does not have it either (force-pushed away and garbage collected), its comments are left out.
+    """
+    commit_diff = get_local_commit_diff(commit_sha)
+    if commit_diff is not None:
+        return commit_diff
 
-        # Skip if there are no review comments
-        monitor_rate_limit()
-        review_comments = pr.get_review_comments()
-        if not review_comments.totalCount:
-            continue
+    monitor_rate_limit()
+    try:
+        commit = repo.get_commit(commit_sha)
+    except UnknownObjectException:
+        print(f"Commit {commit_sha} no longer exists, skipping its review comments")
+        return None
+    return {
+        "sha": commit.sha,
+        "message": commit.commit.message,
+        "files": [{"filename": file.filename, "patch": file.patch} for file in commit.files],
+    }
 
-        for review_comment in review_comments:
-            commit_to_review_comment[review_comment.commit_id] = commit_to_review_comment.get(review_comment.commit_id, []) + [{"body": review_comment.body, "position": review_comment.position, "file_name": review_comment.path}]
+async def get_commit_diff_async(repo: Repository.Repository, commit_sha: str) -> Union[dict, None]:
+    # git runs in a thread of the event loop's executor, the loop keeps serving the requests
+    commit_diff = await asyncio.to_thread(get_local_commit_diff, commit_sha)
+    if commit_diff is not None:
+        return commit_diff
+    try:
+        return await fetch_engine.client.get_commit(repo.full_name, commit_sha)
+    except UnknownObjectException:
+        print(f"Commit {commit_sha} no longer exists, skipping its review comments")
+        return None
 
-        monitor_rate_limit()
-        commits = pr.get_commits()
-        diffs_and_comments.extend(process_commits_in_pr(repo, commit_to_review_comment, pr_title, pr_number, review_comments, commits))
-   
-    return diffs_and_comments
+def get_local_commit_diff(commit_sha: str) -> Union[dict, None]:
+    local_repo = get_local_repo()
+    if local_repo is None:
+        return None
 
-def process_commits_in_pr(repo: Repository.Repository, commit_to_review_comment: dict, pr_title: str, pr_number: int, review_comments: PaginatedList.PaginatedList[PullRequestComment.PullRequestComment], commits: PaginatedList.PaginatedList[Commit.Commit]):
-    commits_with_review_comments = get_commits_by_ids(commits, list(commit_to_review_comment.keys()))
-    diffs_and_comments = []
+    commit_diff = get_commit_diff(local_repo, commit_sha)
+    if commit_diff is None:
+        print(f"Commit {commit_sha} not found in the local clone, falling back to the API")
+    return commit_diff
 
-    for commit in commits_with_review_comments:
-        for file in commit.files:
-            if not has_allowed_extensions(file.filename, constants.ALLOWED_FILE_EXTENSIONS):
+def split_commits_into_code_diffs(pr_commits: dict) -> Iterator[dict]:
+    """
+    Split the patches of the commits of a PR into code diffs. Each code diff is yielded as a task
+    holding the code diff info and what the later steps need (line range, repo, hunks of the file, review comments).
+    """
+    for commit in pr_commits["commits"]:
+        for file in commit["files"]:
+            if not has_allowed_extensions(file["filename"], constants.ALLOWED_FILE_EXTENSIONS):
                 continue
 
-            patch = file.patch
-            if not file.patch:
-                print("PATCH IS NONE")
-                return []
+            patch = file["patch"]
+            # GitHub leaves the patch out for binary and very large files
+            if not patch:
+                print(f"No patch for {file['filename']} in {commit['sha']}")
+                continue
             
-            code_diffs = extract_code_diffs(patch)
-            for header, content in code_diffs:
+            # Shared by the code diffs of the file, the review comments are mapped to the hunks once
+            hunk_index = FileHunkIndex(parse_hunks(patch))
+            for hunk_number, hunk in enumerate(hunk_index.hunks):
+                content = hunk.content
                 # Skip empty diffs
-                if not content.strip():
+                if not content:
                     continue                
         
-                code_diff_info = create_code_diff_info(header, content, pr_title, pr_number, file.filename, commit.sha, commit.commit.message)
-                code_diff_start_line = get_code_diff_start_line(header)
+                code_diff_start_line = hunk.new_start
                 if code_diff_start_line:
-                    code_diff_end_line = code_diff_start_line + len(content.strip().split('\n')) - 1
-                    code_diff_info = add_comments_to_code_diff(commit.sha, code_diff_start_line, code_diff_end_line, commit_to_review_comment, code_diff_info)
-                    code_diff_info = add_function_context_to_code_diff(code_diff_info, code_diff_start_line, code_diff_end_line, repo, file.filename, detect_lang_from_extension(file.filename))
-                    diffs_and_comments.append(code_diff_info)
-
-                    print("Adding entry: ", code_diff_info)   
-
-    return diffs_and_comments
+                    yield {
+                        "code_diff_info": create_code_diff_info(hunk.header, content, pr_commits["pr_title"], pr_commits["pr_number"], file["filename"], commit["sha"], commit["message"]),
+                        "hunk_index": hunk_index,
+                        "hunk_number": hunk_number,
+                        # Lines of the hunk in the new file, the removed lines do not count
+                        "start_line": code_diff_start_line,
+                        "end_line": max(hunk.new_end, code_diff_start_line),
+                        "repo": pr_commits["repo"],
+                        "comment_index": pr_commits["comment_index"],
+                    }
+
+def map_comments_to_code_diff(code_diff_task: dict) -> dict:
+    code_diff_info = code_diff_task["code_diff_info"]
+    add_comments_to_code_diff(code_diff_info, code_diff_task["hunk_index"], code_diff_task["hunk_number"], code_diff_task["comment_index"])
+    return code_diff_task
+
+def add_function_context_to_code_diff_task(code_diff_task: dict) -> dict:
+    code_diff_info = code_diff_task["code_diff_info"]
+    file_name = code_diff_info["file_name"]
+    # The file content may have to be fetched with the API
+    call_with_rate_limit_retries(add_function_context_to_code_diff, code_diff_info, code_diff_task["start_line"], code_diff_task["end_line"], code_diff_task["repo"], file_name, detect_lang_from_extension(file_name))
+    return code_diff_task
 
 
 def create_code_diff_info(header: str, content: str, pr_title: str, pr_number: int, file_name: str, commit_id: str, commit_msg: str):
@@ -175,51 +417,77 @@ def create_code_diff_info(header: str, content: str, pr_title: str, pr_number: i
     }
 
 
-def add_comments_to_code_diff(commit_id: str, code_diff_start_line: int, code_diff_end_line: int, commit_to_review_comment: dict, code_diff_info: dict):
+def add_comments_to_code_diff(code_diff_info: dict, hunk_index: FileHunkIndex, hunk_number: int, comment_index: CommentIndex):
     """
-    Add comments to a code diff if the comment's position matches the diff's lines.
+    Add the review comments made on the hunk of a code diff (see comment_mapping.FileHunkIndex).
     """
-    comments_in_commit = commit_to_review_comment.get(commit_id)
-
-    for comment in comments_in_commit:
-        if is_comment_in_code_diff(code_diff_info["file_name"], comment["file_name"], code_diff_start_line, comment["position"], code_diff_end_line):
-            print("Found a review comment")
-            code_diff_info["comments"].append({"comment": comment["body"], "position": comment["position"]})
+    comments_in_file = comment_index.get_comments(code_diff_info["commit_id"], code_diff_info["file_name"])
+    comments = hunk_index.assign_comments(comments_in_file)[hunk_number]
+    if comments:
+        print(f"Found {len(comments)} review comments")
+    code_diff_info["comments"].extend(comments)
 
     return code_diff_info
 
 
-def monitor_rate_limit():
-    global auth
-    # Get the current rate limit status for core API requests
-    rate_limit = auth.get_rate_limit().core
-    
-    if rate_limit.remaining < 100:
-        # If rate limit is exceeded, calculate time until reset
-        reset_time = rate_limit.reset.timestamp() - time.time()
-        print(f"Rate limit exceeded. Sleeping for {reset_time} seconds.")
-        
-        # Sleep until the rate limit is reset
-        if reset_time >= 0:
-            time.sleep(reset_time)
-        else:
-            while reset_time < 0:
-                print("Negative reset time. Waiting for the rate limit to get reset.")
-                time.sleep(10)
-                rate_limit = auth.get_rate_limit().core
-                reset_time = rate_limit.reset.timestamp() - time.time()
+def share_rate_limit_budget(shared_budget):
+    """
+    Draw the core API requests from a budget shared with other processes (see rate_limiter.create_shared_budget).
+    """
+    rate_limit_governor.bucket = SharedTokenBucket(constants.RATE_LIMIT_RESERVE, shared_budget)
+
 
-    else:
-        print(f"Rate limit OK. Remaining requests: {rate_limit.remaining}")
+def monitor_rate_limit():
+    # The budget comes from the rate limit headers of the previous responses, this usually does not need a request
+    remaining = rate_limit_governor.wait(auth)
+    print(f"Rate limit OK. Remaining requests: {remaining}")
 
 # Fetches file content of a particular file at any given commit. The commit ID of the required 
 # should be passed to the `ref` parameter
 def get_file_content(repo: Repository.Repository, file_path: str, ref='main') -> str:
     """Fetch the full content of a file from the repository."""
+    # Read it from the local clone when it has the commit, the API is only a fallback
+    content = get_local_file_content(file_path, ref)
+    if content is not None:
+        return content
+
+    if fetch_engine is not None:
+        return fetch_engine.run(fetch_engine.client.get_file_content(repo.full_name, file_path, ref))
+
     file_content = repo.get_contents(file_path, ref=ref)
     return file_content.decoded_content.decode('utf-8')
 
 
+def get_local_repo() -> Union[git.Repo, None]:
+    """
+    Return the local clone opened by the calling thread; GitPython repos must not be shared between threads.
+    """
+    if local_repo_path is None:
+        return None
+
+    if getattr(local_repos, "path", None) != local_repo_path:
+        local_repos.repo = git.Repo(local_repo_path)
+        local_repos.path = local_repo_path
+    return local_repos.repo
+
+
+def get_local_file_content(file_path: str, ref: str) -> Union[str, None]:
+    """
+    Read a file at a commit straight from the object database of the local clone.
+    Returns None if there is no clone or it does not have the commit or the file.
+    """
+    local_repo = get_local_repo()
+    if local_repo is None:
+        return None
+
+    try:
+        blob = local_repo.commit(ref).tree / file_path
+        return blob.data_stream.read().decode('utf-8')
+    except (ValueError, KeyError, BadName, BadObject) as e:
+        print(f"{file_path} at {ref} not found in the local clone, falling back to the API: {e}")
+        return None
+
+
 def add_function_context_to_code_diff(code_diff: dict, code_diff_start_line: int, code_diff_end_line: int, repo: Repository.Repository, file_path: str, language: str):
     code_diff["fn_context"] = extract_function_code(repo, file_path, code_diff["commit_id"], code_diff_start_line, code_diff_end_line, language)
 
@@ -239,20 +507,51 @@ def extract_function_code(repo: Repository.Repository, file_path: str, commit_sh
     Returns:
     - A list of function codes as strings.
     """
-    full_content = get_file_content(repo, file_path, commit_sha)
+    file_context = get_file_function_context(repo, file_path, commit_sha, language)
     function_code = ""
     
     if code_diff_start_line and code_diff_end_line:
-        function_code = extract_function_from_full_content(full_content, code_diff_start_line, code_diff_end_line, language)
+        function_code = file_context.get_functions_in_range(code_diff_start_line, code_diff_end_line)
     
     return function_code
 
+def get_file_function_context(repo: Repository.Repository, file_path: str, commit_sha: str, language: str) -> FileFunctionContext:
+    """
+    Fetch and parse a file at a commit once; the hunks of the same file are then answered from the cache.
+    """
+    key = (repo.full_name, commit_sha, file_path)
+    with file_context_lock:
+        file_context = file_context_cache.get(key)
+        if file_context is not None:
+            file_context_cache.move_to_end(key)
+            return file_context
+
+    file_context = FileFunctionContext(get_file_content(repo, file_path, commit_sha), language)
+    with file_context_lock:
+        file_context_cache[key] = file_context
+        if len(file_context_cache) > constants.FILE_CONTEXT_CACHE_SIZE:
+            file_context_cache.popitem(last=False)
+
+    return file_context
+
 def clone_repo_to_path(repo_name: str, repo_path: str):
-    if auth:
-        repo = auth.get_repo(repo_name)
-    else:
-        print("Failed to clone repo: auth is None")
-        return None
-    
-    git.Repo.clone_from(repo.clone_url, repo_path)
-    print(f"Repository '{repo_name}' cloned to {repo_path}")
+    """
+    Check the default branch of a repository out into `repo_path`. The repository is cloned once into
+    the clone cache and only updated on later runs (see repo_cache).
+    """
+    global local_repo_path
+    bare_repo = update_repo_cache(repo_name)
+    checkout_worktree(bare_repo, repo_path)
+    local_repo_path = repo_path
+    print(f"Repository '{repo_name}' checked out to {repo_path}")
+
+
+def fetch_PR_refs_to_local_repo(approved_prs: Sequence[dict]):
+    """
+    Fetch the head commits of the approved PRs into the local clone, so that the files of their
+    commits (also those of PRs opened from forks) are read without the API.
+    """
+    local_repo = get_local_repo()
+    if local_repo is None:
+        return
+    fetch_pull_request_refs(local_repo, [pr_record["number"] for pr_record in approved_prs])
@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Union
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+import constants
+
+# Headers that describe the connection or the encoding of the body, not the response itself
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length", "proxy-authenticate", "proxy-authorization", "te", "trailer", "upgrade"}
+# Request headers not forwarded upstream: the cassette must hold full bodies, never a 304
+NOT_FORWARDED_HEADERS = HOP_BY_HOP_HEADERS | {"host", "accept-encoding", "if-none-match", "if-modified-since"}
+
+
+def get_request_key(method: str, path: str, body: bytes = b"") -> str:
+    """
+    Key of a request in a cassette: the method, the path and the sorted query, and a hash of the body
+    (GraphQL queries are POSTs to the same path). The host and the headers (token) are left out.
+    """
+    url = urlsplit(path)
+    key = f"{method} {url.path}"
+    query = urlencode(sorted(parse_qsl(url.query, keep_blank_values=True)))
+    if query:
+        key += "?" + query
+    if body:
+        key += " " + hashlib.sha256(body).hexdigest()
+    return key
+
+
+class CassetteStore:
+    """
+    Responses recorded from GitHub, in a SQLite file, keyed by get_request_key. A request made
+    several times during the recording keeps its last response.
+    """
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        # Shared by the threads of the server
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB)")
+        self.connection.commit()
+        self.lock = threading.Lock()
+
+    def save(self, key: str, status: int, headers: Dict[str, str], body: bytes):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, status, json.dumps(headers), body))
+            self.connection.commit()
+
+    def load(self, key: str):
+        """
+        Return (status, headers, body) of a recorded request, None if it was not recorded.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT status, headers, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class RateLimitWindow:
+    """
+    Core rate limit of the replay server: `limit` requests per window of `window_seconds`.
+    """
+    def __init__(self, limit: int, window_seconds: float):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.used = 0
+        self.reset_at = time.time() + window_seconds
+        self.lock = threading.Lock()
+
+    def take(self, count: bool = True):
+        """
+        Count a request; returns (allowed, remaining, reset time).
+        """
+        with self.lock:
+            if time.time() >= self.reset_at:
+                self.used = 0
+                self.reset_at = time.time() + self.window_seconds
+            if self.used >= self.limit:
+                return False, 0, self.reset_at
+            if count:
+                self.used += 1
+            return True, self.limit - self.used, self.reset_at
+
+    def get_headers(self, remaining: int, reset_at: float) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Used": str(self.limit - remaining),
+            "X-RateLimit-Reset": str(int(reset_at)),
+            "X-RateLimit-Resource": "core",
+        }
+
+
+class GitHubStandIn(ThreadingHTTPServer):
+    """
+    Local stand-in for the GitHub API, in one of two modes:
+
+    - "record": forwards the requests to `upstream` and saves every response in the cassette.
+    - "replay": answers from the cassette only, after `latency` seconds (plus up to `latency_jitter`),
+      with its own rate limit headers (`rate_limit` requests per `rate_limit_window` seconds) and 304s
+      for conditional requests whose ETag matches.
+
+    In both modes the upstream URL is replaced by the URL of the server in the bodies and headers, so
+    that clients pointed at the server (GITHUB_API_URL) follow the links of the responses to it.
+    """
+    daemon_threads = True
+
+    def __init__(self, mode: str, cassette: CassetteStore, host: str = "127.0.0.1", port: int = 0, upstream: str = constants.GITHUB_UPSTREAM_URL,
+                 latency: float = 0.0, latency_jitter: float = 0.0, rate_limit: int = 5000, rate_limit_window: float = 3600, seed: int = 0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unsupported mode: {mode}")
+        super().__init__((host, port), GitHubStandInHandler)
+        self.mode = mode
+        self.cassette = cassette
+        self.upstream = upstream.rstrip("/")
+        self.base_url = f"http://{host}:{self.server_address[1]}"
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit_window = RateLimitWindow(rate_limit, rate_limit_window)
+        # Seeded, so that replays take the same time
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.session = requests.Session()
+        self.missed_keys = []
+
+    def rewrite(self, data: Union[str, bytes]):
+        if isinstance(data, bytes):
+            return data.replace(self.upstream.encode('utf-8'), self.base_url.encode('utf-8'))
+        return data.replace(self.upstream, self.base_url)
+
+    def get_delay(self) -> float:
+        with self.random_lock:
+            return self.latency + self.random.uniform(0, self.latency_jitter)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name=f"github-{self.mode}", daemon=True)
+        thread.start()
+        return thread
+
+
+class GitHubStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_api_request()
+
+    def do_POST(self):
+        self.handle_api_request()
+
+    def handle_api_request(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        key = get_request_key(self.command, self.path, body)
+        if self.server.mode == "record":
+            self.record(key, body)
+        else:
+            self.replay(key)
+
+    def record(self, key: str, body: bytes):
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in NOT_FORWARDED_HEADERS}
+        response = self.server.session.request(self.command, self.server.upstream + self.path, headers=headers, data=body or None, allow_redirects=False, timeout=60)
+        response_headers = {name: value for name, value in response.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+        self.server.cassette.save(key, response.status_code, response_headers, response.content)
+        self.send(response.status_code, response_headers, response.content)
+
+    def replay(self, key: str):
+        time.sleep(self.server.get_delay())
+
+        if urlsplit(self.path).path == "/rate_limit":
+            # Answered from the rate limit of the server, it does not count against it
+            _, remaining, reset_at = self.server.rate_limit_window.take(count=False)
+            core = {"limit": self.server.rate_limit_window.limit, "remaining": remaining, "reset": int(reset_at), "used": self.server.rate_limit_window.limit - remaining}
+            rate_limit = {"resources": {"core": core}, "rate": core}
+            self.send(200, self.server.rate_limit_window.get_headers(remaining, reset_at), json.dumps(rate_limit).encode('utf-8'))
+            return
+
+        recorded = self.server.cassette.load(key)
+        if recorded is None:
+            print(f"Not in the cassette: {key}")
+            self.server.missed_keys.append(key)
+            self.send(404, {"Content-Type": "application/json"}, json.dumps({"message": "Not Found in the cassette"}).encode('utf-8'))
+            return
+        status, headers, body = recorded
+
+        etag = headers.get("ETag")
+        not_modified = status == 200 and etag is not None and self.headers.get("If-None-Match") == etag
+        # Like GitHub, 304s do not count against the rate limit
+        allowed, remaining, reset_at = self.server.rate_limit_window.take(count=not not_modified)
+        headers = {**headers, **self.server.rate_limit_window.get_headers(remaining, reset_at)}
+        if not allowed:
+            message = {"message": "API rate limit exceeded (replay)", "documentation_url": "https://docs.github.com/rest/overview/resources-in-the-rest-api#rate-limiting"}
+            self.send(403, {**headers, "Content-Type": "application/json"}, json.dumps(message).encode('utf-8'))
+        elif not_modified:
+            self.send(304, headers, b"")
+        else:
+            self.send(status, headers, body)
+
+    def send(self, status: int, headers: Dict[str, str], body: bytes):
+        body = self.server.rewrite(body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, self.server.rewrite(value))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local stand-in for the GitHub API: record the responses of a run into a cassette, or replay them offline.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", default=constants.CASSETTE_PATH, help="SQLite file holding the recorded responses")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--upstream", default=constants.GITHUB_UPSTREAM_URL, help="API the requests are forwarded to when recording")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every replayed response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    parser.add_argument("--rate-limit", type=int, default=5000, help="core requests per window when replaying")
+    parser.add_argument("--rate-limit-window", type=float, default=3600, help="seconds until the replay rate limit resets")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the latency jitter")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cassette = CassetteStore(args.cassette)
+    server = GitHubStandIn(args.mode, cassette, port=args.port, upstream=args.upstream, latency=args.latency, latency_jitter=args.latency_jitter,
+                           rate_limit=args.rate_limit, rate_limit_window=args.rate_limit_window, seed=args.seed)
+    print(f"{args.mode.capitalize()}ing GitHub API responses ({len(cassette)} in {args.cassette}) at {server.base_url}")
+    print(f"Set GITHUB_API_URL = \"{server.base_url}\" in src/constants.py to use it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        cassette.close()
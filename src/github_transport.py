@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Union
+import requests
+from github.Requester import Requester, RequestsResponse
+
+# Sessions shared by every connection, keyed by protocol. Each keeps a pool of keep-alive connections.
+_sessions = {}
+_sessions_lock = threading.Lock()
+# ResponseCache used by the connections, None when responses are not cached
+_response_cache = None
+
+
+def get_shared_session(protocol: str, retry, pool_size: int) -> requests.Session:
+    with _sessions_lock:
+        session = _sessions.get(protocol)
+        if session is None:
+            session = requests.Session()
+            # having Session.auth set something other than None disables falling back to .netrc file
+            session.auth = Requester.noopAuth
+            adapter = requests.adapters.HTTPAdapter(
+                max_retries=retry if retry is not None else requests.adapters.DEFAULT_RETRIES,
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+            )
+            session.mount(f"{protocol}://", adapter)
+            _sessions[protocol] = session
+        return session
+
+
+class ResponseCache:
+    """
+    GET responses stored on disk with their ETag or Last-Modified, one JSON file per URL.
+
+    A cached URL is requested again with If-None-Match / If-Modified-Since: GitHub answers 304 without
+    a body when nothing changed, and 304s do not count against the core rate limit. The files are
+    written atomically, so the processes of main.py can share the directory.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_path(self, url: str, headers: Dict[str, str]) -> str:
+        # GitHub sends a different body for a different media type
+        accept = requests.structures.CaseInsensitiveDict(headers).get("Accept", "")
+        key = hashlib.sha256(f"{accept} {url}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def load(self, url: str, headers: Dict[str, str]) -> Union[Dict, None]:
+        try:
+            with open(self.get_path(url, headers), 'r', encoding='utf-8') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url: str, headers: Dict[str, str], response: requests.Response):
+        # Header names are case-insensitive (HTTP/2 front ends send them in lowercase), they are stored in lowercase
+        response_headers = {name.lower(): value for name, value in response.headers.items()}
+        if "etag" not in response_headers and "last-modified" not in response_headers:
+            return
+
+        path = self.get_path(url, headers)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".partial")
+        try:
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as cache_file:
+                json.dump({"url": url, "headers": response_headers, "body": response.text}, cache_file)
+            os.replace(temporary_path, path)
+        except OSError as e:
+            print(f"Failed to cache the response of {url}: {e}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+
+def get_conditional_headers(cached: Dict) -> Dict[str, str]:
+    # Files cached before the names were lowercased have them as sent
+    cached_headers = requests.structures.CaseInsensitiveDict(cached["headers"])
+    conditional_headers = {}
+    if "ETag" in cached_headers:
+        conditional_headers["If-None-Match"] = cached_headers["ETag"]
+    if "Last-Modified" in cached_headers:
+        conditional_headers["If-Modified-Since"] = cached_headers["Last-Modified"]
+    return conditional_headers
+
+
+def replay_cached_response(cached: Dict, not_modified: requests.Response) -> requests.Response:
+    """
+    Turn a 304 into the cached 200 response, with the headers of the 304 (current rate limit) on top.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.headers = requests.structures.CaseInsensitiveDict(cached["headers"])
+    response.headers.update(not_modified.headers)
+    response._content = cached["body"].encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = not_modified.url
+    response.request = not_modified.request
+    return response
+
+
+class PooledConnection:
+    """
+    Drop-in replacement of PyGithub's connection classes.
+
+    PyGithub keeps the pending request on the connection object, so one shared connection
+    cannot serve several threads. Once injected, the Requester creates a connection per request
+    instead; these are cheap because they all send through the same pooled session.
+    """
+    protocol = "https"
+    default_port = 443
+
+    # mimic the httplib connection object
+    def __init__(self, host: str, port=None, strict: bool = False, timeout=None, retry=None, pool_size=None, **kwargs):
+        self.host = host
+        self.port = port if port else self.default_port
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.session = get_shared_session(self.protocol, retry, pool_size or requests.adapters.DEFAULT_POOLSIZE)
+
+    def request(self, verb: str, url: str, input, headers: Dict[str, str]) -> None:
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self) -> RequestsResponse:
+        url = f"{self.protocol}://{self.host}:{self.port}{self.url}"
+        headers = self.headers
+        cached = None
+        # Requests that are already conditional handle the 304 themselves
+        cacheable = _response_cache is not None and self.verb == "GET" and not any(
+            header.lower() in ("if-none-match", "if-modified-since") for header in headers
+        )
+        if cacheable:
+            cached = _response_cache.load(url, headers)
+            if cached is not None:
+                headers = {**headers, **get_conditional_headers(cached)}
+
+        response = self.session.request(
+            self.verb,
+            url,
+            headers=headers,
+            data=self.input,
+            timeout=self.timeout,
+            verify=self.verify,
+            allow_redirects=False,
+        )
+
+        if cacheable:
+            if response.status_code == 304 and cached is not None:
+                response = replay_cached_response(cached, response)
+            elif response.status_code == 200:
+                _response_cache.store(url, self.headers, response)
+        return RequestsResponse(response)
+
+    def close(self) -> None:
+        # The pooled session outlives the connection
+        pass
+
+
+class PooledHTTPConnection(PooledConnection):
+    protocol = "http"
+    default_port = 80
+
+
+def install_pooled_connections(cache_dir: str = None):
+    """
+    Make every Github client created afterwards send its requests through the pooled connections.
+    With `cache_dir`, their GET responses are cached there and revalidated with conditional requests.
+    """
+    global _response_cache
+    _response_cache = ResponseCache(cache_dir) if cache_dir is not None else None
+    Requester.injectConnectionClasses(PooledHTTPConnection, PooledConnection)
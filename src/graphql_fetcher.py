@@ -0,0 +1,154 @@
+import time
+from datetime import datetime
+from typing import Dict, Union
+import requests
+from github import GithubException, RateLimitExceededException
+import constants
+
+# Closed PRs, most recently updated first, with everything the pipeline needs.
+# A query costs about (1 + 3 * page size + 20 * page size) / 100 points of the GraphQL budget.
+CLOSED_PRS_QUERY = """
+query ($owner: String!, $name: String!, $cursor: String, $pageSize: Int!) {
+  rateLimit { cost remaining resetAt }
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: [CLOSED, MERGED], first: $pageSize, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
+      totalCount
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        headRefOid
+        updatedAt
+        approvals: reviews(states: [APPROVED]) { totalCount }
+        reviewThreads(first: 20) {
+          pageInfo { hasNextPage }
+          nodes {
+            diffSide
+            comments(first: 50) {
+              pageInfo { hasNextPage }
+              nodes {
+                body
+                path
+                position
+                line
+                originalLine
+                commit { oid }
+                originalCommit { oid }
+              }
+            }
+          }
+        }
+        commits(first: 100) {
+          pageInfo { hasNextPage }
+          nodes { commit { oid message } }
+        }
+      }
+    }
+  }
+}
+"""
+
+session = requests.Session()
+
+
+def run_query(access_token: str, query: str, variables: Dict) -> Dict:
+    response = session.post(
+        constants.GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": f"bearer {access_token}"},
+        timeout=constants.GRAPHQL_TIMEOUT_SECONDS,
+    )
+    headers = dict(response.headers)
+    data = response.json() if response.content else None
+
+    if response.status_code in (403, 429) or any(error.get("type") == "RATE_LIMITED" for error in (data or {}).get("errors", [])):
+        raise RateLimitExceededException(response.status_code, data, headers)
+    if response.status_code != 200 or data is None or "errors" in data:
+        raise GithubException(response.status_code, data, headers)
+
+    return data["data"]
+
+
+def wait_for_graphql_budget(rate_limit: Dict):
+    """
+    GraphQL has its own budget of points. Sleep until it resets when the next query may not fit.
+    """
+    if rate_limit["remaining"] >= 2 * rate_limit["cost"]:
+        return
+
+    reset_time = parse_timestamp(rate_limit["resetAt"]) - time.time()
+    reset_time += constants.RATE_LIMIT_RESET_MARGIN_SECONDS
+    print(f"GraphQL rate limit exceeded. Sleeping for {reset_time} seconds.")
+    time.sleep(max(reset_time, 0))
+
+
+def to_pr_record(repo_name: str, node: Dict) -> Dict:
+    """
+    Turn a pull request node into a PR record (see pr_store.PR_RECORD_COLUMNS). The review comments or
+    commits are None when the query could not return all of them; they are then fetched with the REST API.
+    """
+    approved = node["approvals"]["totalCount"] > 0
+    review_comments = []
+    # The review comments are read by thread, the side of the diff they are on belongs to the thread
+    review_threads = node["reviewThreads"]
+    if not approved or review_threads["pageInfo"]["hasNextPage"]:
+        review_comments = None
+
+    for review_thread in review_threads["nodes"]:
+        if review_comments is None or review_thread["comments"]["pageInfo"]["hasNextPage"]:
+            review_comments = None
+            break
+        for comment in review_thread["comments"]["nodes"]:
+            review_comments.append({
+                "body": comment["body"],
+                "position": comment["position"],
+                "line": comment["line"],
+                "original_line": comment["originalLine"],
+                "side": review_thread["diffSide"],
+                "file_name": comment["path"],
+                "commit_id": comment["commit"]["oid"] if comment["commit"] else None,
+                "original_commit_id": comment["originalCommit"]["oid"] if comment["originalCommit"] else None,
+            })
+
+    commits = None
+    if approved and not node["commits"]["pageInfo"]["hasNextPage"]:
+        commits = [{"sha": commit["commit"]["oid"], "message": commit["commit"]["message"]} for commit in node["commits"]["nodes"]]
+
+    return {
+        "number": node["number"],
+        "updated_at": parse_timestamp(node["updatedAt"]),
+        "title": node["title"],
+        "base_repo": repo_name,
+        "head_sha": node["headRefOid"],
+        "approved": approved,
+        "review_comments": review_comments,
+        "commits": commits,
+    }
+
+
+def parse_timestamp(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+
+
+def fetch_pr_records_page(access_token: str, repo_name: str, cursor: Union[str, None], page_size: int = constants.GRAPHQL_PR_PAGE_SIZE):
+    """
+    Fetch a page of closed PRs. Returns their PR records, the update times of the oldest and newest
+    PR of the page, and the cursor of the next page (None after the last one).
+    """
+    owner, name = repo_name.split("/")
+    data = run_query(access_token, CLOSED_PRS_QUERY, {"owner": owner, "name": name, "cursor": cursor, "pageSize": page_size})
+    pull_requests = data["repository"]["pullRequests"]
+    print(f"Scanned {len(pull_requests['nodes'])} of {pull_requests['totalCount']} closed PRs")
+
+    pr_records = [to_pr_record(repo_name, node) for node in pull_requests["nodes"]]
+    for pr_record in pr_records:
+        if pr_record["approved"]:
+            print("Approved PR found: ", pr_record["number"])
+
+    next_cursor = None
+    if pull_requests["pageInfo"]["hasNextPage"]:
+        next_cursor = pull_requests["pageInfo"]["endCursor"]
+        wait_for_graphql_budget(data["rateLimit"])
+
+    updated_ats = [pr_record["updated_at"] for pr_record in pr_records]
+    return pr_records, min(updated_ats, default=None), max(updated_ats, default=None), next_cursor
@@ -1,10 +1,12 @@
 import pandas as pd
-import re
+import bisect
 import os
 import json
 import csv
-from language_parser import LANGUAGE_MAP
-from typing import Union
+from language_parser import DEFINITION_QUERY_MAP, get_parser
+from diff_parser import iter_hunks, parse_hunk_header
+import constants
+from typing import List, Union
 import tree_sitter
 import parso
 import shutil
@@ -14,22 +16,11 @@ def get_repo_names_from_file(filename):
     df = pd.read_excel(filename, sheet_name='Result 1')
     return df['repo_full_name'].tolist()
 
-def get_code_diff_start_line(code_diff_header):
-    match = re.match(r'@@ -\d+,\d+ \+(\d+),\d+ @@', code_diff_header)
-    if match:
-        return int(match.group(1))  # Returns the starting line in the "new" version of the file
-    return None
-
 def extract_code_diffs(patch):
-    code_diffs = []
-    # Regular expression to capture the code_diff header and content
-    pattern = re.compile(r'(@@ -\d+,\d+ \+\d+,\d+ @@)(.*?)\n(?=(@@|\Z))', re.DOTALL)
-    matches = pattern.findall(patch)
-    for match in matches:
-        header = match[0]
-        content = match[1].strip()
-        code_diffs.append((header, content))
-    return code_diffs
+    """
+    Split a patch into (header, content) tuples, one per hunk (see diff_parser.iter_hunks).
+    """
+    return [(hunk.header, hunk.content) for hunk in iter_hunks(patch)]
 
 def write_json_to_file(data, file_path):
     """
@@ -96,9 +87,7 @@ def has_allowed_extensions(filepath, allowed_extensions):
 
 def detect_lang_from_extension(filepath):
     extension = os.path.splitext(os.path.basename(filepath))[1].lower()
-    extension_to_lang = {".py": "python", ".cpp": "cpp", ".c": "c", ".java": "java", ".js": "javascript", ".go": "golang"}
-
-    return extension_to_lang.get(extension, None)
+    return constants.EXTENSION_TO_LANGUAGE.get(extension, None)
 
 
 # Using parso
@@ -115,62 +104,83 @@ def extract_python_functions_using_parso(code, start_line, end_line):
     return ("\n\n").join(functions_in_diff)
 
 
-def extract_function_from_full_content(code: str, diff_start_line: int, diff_end_line: int, language: str):
-    # Initialize the tree-sitter parser as before
-    parser = tree_sitter.Parser()
-    tree_sitter_language = LANGUAGE_MAP.get(language)
-    if tree_sitter_language is None:
-        print("Language could not be loaded.")
-        return None
-    else:
-        print("Language loaded successfully.")
-
-    parser.set_language(tree_sitter_language)
-
-    # Parse the cpp code
-    try:
-        tree = parser.parse(bytes(code, "utf8"))
-    except Exception as e:
-        print(f"Parsing failed for: \n{code}\n")
-        print(f"Error:\n{e}")
-        if language == "python":
-            return extract_python_functions_using_parso(code, diff_start_line, diff_end_line)
-        return None
+def get_outermost_function_nodes(tree: tree_sitter.Tree, language: str) -> List[tree_sitter.Node]:
+    """
+    Return the outermost function nodes of a parsed file in source order, using the compiled
+    definition query of the language. Nested functions are part of the code of their parent.
+    """
+    function_nodes = [node for node, capture_name in DEFINITION_QUERY_MAP[language].captures(tree.root_node) if capture_name == "definition.function"]
+    function_nodes.sort(key=lambda node: (node.start_byte, -node.end_byte))
 
-    root_node = tree.root_node
+    outermost_function_nodes = []
+    last_function_end = -1
+    for node in function_nodes:
+        if node.start_byte >= last_function_end:
+            outermost_function_nodes.append(node)
+            last_function_end = node.end_byte
 
-    # Split the code into lines for extracting function code
-    code_lines = code.splitlines()
-    functions_in_diff = []
-    function_markers = ["function", "function_declaration", "method_declaration", "function_definition"]
-    # Traverse the tree to find functions
-    def find_functions(node):
-        # Check if node is a function
-        if node.type in function_markers:
-            func_start = node.start_point[0] + 1  # Convert to 1-based line numbers
-            func_end = node.end_point[0] + 1
-
-            # Check if function overlaps with the specified line range
-            if func_start <= diff_end_line and func_end >= diff_start_line:
-                # Extract the function code using line range
-                function_code = "\n".join(code_lines[func_start - 1:func_end])
-                functions_in_diff.append(function_code)
-
-        # Recursively visit each child node
-        for child in node.children:
-            if node.type not in function_markers:
-                find_functions(child)
-            
-    find_functions(root_node)
+    return outermost_function_nodes
 
-    return ("\n\n").join(functions_in_diff)
+
+class FileFunctionContext:
+    """
+    A file parsed once, with the sorted line spans of its outermost functions, so that the
+    functions overlapping any number of code diffs are found by interval lookup.
+    """
+    def __init__(self, code: str, language: str):
+        self.code = code
+        self.language = language
+        self.code_lines = code.splitlines()
+        self.tree = None
+        # (start line, end line) of the outermost functions, 1-based. Functions do not overlap,
+        # so both the start and the end lines are sorted.
+        self.function_spans = []
+        self.function_ends = []
+
+        parser = get_parser(language)
+        if parser is None:
+            print("Language could not be loaded.")
+            return
+
+        try:
+            self.tree = parser.parse(bytes(code, "utf8"))
+        except Exception as e:
+            print(f"Parsing failed for: \n{code}\n")
+            print(f"Error:\n{e}")
+            return
+
+        for node in get_outermost_function_nodes(self.tree, language):
+            self.function_spans.append((node.start_point[0] + 1, node.end_point[0] + 1))  # Convert to 1-based line numbers
+        self.function_ends = [func_end for _, func_end in self.function_spans]
+
+    def get_functions_in_range(self, diff_start_line: int, diff_end_line: int):
+        if self.tree is None:
+            # Python files that tree-sitter failed on are parsed with parso instead
+            if self.language == "python":
+                return extract_python_functions_using_parso(self.code, diff_start_line, diff_end_line)
+            return None
+
+        functions_in_diff = []
+        # First function that ends at or after the start of the diff
+        i = bisect.bisect_left(self.function_ends, diff_start_line)
+        while i < len(self.function_spans) and self.function_spans[i][0] <= diff_end_line:
+            func_start, func_end = self.function_spans[i]
+            # Extract the function code using line range
+            functions_in_diff.append("\n".join(self.code_lines[func_start - 1:func_end]))
+            i += 1
+
+        return ("\n\n").join(functions_in_diff)
+
+
+def extract_function_from_full_content(code: str, diff_start_line: int, diff_end_line: int, language: str):
+    return FileFunctionContext(code, language).get_functions_in_range(diff_start_line, diff_end_line)
 
 
 def get_code_diff_start_line(code_diff_header: str) -> Union[int, None]:
     """Extracts the starting line number from the code diff header."""
-    match = re.match(r'@@ -\d+,\d+ \+(\d+),\d+ @@', code_diff_header)
-    if match:
-        return int(match.group(1))  # Returns the starting line in the "new" version of the file
+    hunk = parse_hunk_header(code_diff_header, 0)
+    if hunk:
+        return hunk.new_start  # Returns the starting line in the "new" version of the file
     return None
 
 
@@ -1,5 +1,10 @@
+import os
+import threading
+import tree_sitter
 from tree_sitter_languages import get_language
 
+QUERIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries")
+
 # Load precompiled languages
 def load_tree_sitter_libraries():
     return {
@@ -11,5 +16,40 @@ def load_tree_sitter_libraries():
         "golang": get_language('go')
     }
 
+# Compile the queries/<kind>/<language>.scm query of every language
+def load_tree_sitter_queries(kind):
+    queries = {}
+    for language_name, language in LANGUAGE_MAP.items():
+        with open(os.path.join(QUERIES_DIR, kind, f"{language_name}.scm"), 'r') as query_file:
+            queries[language_name] = language.query(query_file.read())
+    return queries
+
 # Map the language string to tree-sitter languages
-LANGUAGE_MAP = load_tree_sitter_libraries()
\ No newline at end of file
+LANGUAGE_MAP = load_tree_sitter_libraries()
+
+# Queries capturing function definitions (@definition.function, @name, or the C/C++ @declarator holding it) and callees, called by name (@call)
+# or on a receiver (@method: obj.f(), pkg.f(), ns::f(), with the Go operand as @receiver)
+DEFINITION_QUERY_MAP = load_tree_sitter_queries("definitions")
+CALL_QUERY_MAP = load_tree_sitter_queries("calls")
+
+# Parsers are not thread-safe, so every worker thread keeps its own parser per language
+_parser_pool = threading.local()
+
+def get_parser(language):
+    """
+    Return the tree-sitter parser for `language` owned by the calling thread, or None if the language is not supported.
+    """
+    parsers = getattr(_parser_pool, "parsers", None)
+    if parsers is None:
+        parsers = _parser_pool.parsers = {}
+
+    parser = parsers.get(language)
+    if parser is None:
+        tree_sitter_language = LANGUAGE_MAP.get(language)
+        if tree_sitter_language is None:
+            return None
+        parser = tree_sitter.Parser()
+        parser.set_language(tree_sitter_language)
+        parsers[language] = parser
+
+    return parser
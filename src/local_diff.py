@@ -0,0 +1,98 @@
+import re
+from typing import Dict, List, Union
+import git
+from gitdb.exc import BadName, BadObject
+import constants
+
+# Tree of a commit without parent is compared to the empty tree
+EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+# Escapes git uses in quoted paths
+QUOTED_PATH_ESCAPES = {'"': '"', '\\': '\\', 't': '\t', 'n': '\n', 'r': '\r', 'a': '\a', 'b': '\b', 'f': '\f', 'v': '\v'}
+QUOTED_PATH_ESCAPE_PATTERN = re.compile(r'\\([0-7]{3}|.)')
+
+
+def unquote_path(path: str) -> str:
+    """
+    Undo the quoting git applies to paths with special characters ("a\\tb" -> a<tab>b).
+    """
+    if not (path.startswith('"') and path.endswith('"')):
+        return path
+
+    quoted = path[1:-1]
+    # Octal escapes are single bytes of the UTF-8 encoded path
+    unquoted = bytearray()
+    position = 0
+    for match in QUOTED_PATH_ESCAPE_PATTERN.finditer(quoted):
+        unquoted += quoted[position:match.start()].encode('utf-8')
+        escape = match.group(1)
+        if len(escape) == 3:
+            unquoted.append(int(escape, 8))
+        else:
+            unquoted += QUOTED_PATH_ESCAPES.get(escape, escape).encode('utf-8')
+        position = match.end()
+    unquoted += quoted[position:].encode('utf-8')
+    return unquoted.decode('utf-8', errors='replace')
+
+
+def parse_git_diff(diff_output: str) -> List[Dict[str, str]]:
+    """
+    Split the output of `git diff` into the files it changes, as {"filename", "patch"} dicts like
+    the files of a GitHub commit: the patch starts at the first hunk header and has no trailing newline.
+    Files without hunks (binary files, renames without changes, mode changes) are left out.
+    """
+    files = []
+    filename = None
+    patch_lines = None
+
+    def add_file():
+        if filename is not None and patch_lines:
+            files.append({"filename": filename, "patch": "\n".join(patch_lines)})
+
+    for line in diff_output.split("\n"):
+        if line.startswith("diff --git "):
+            add_file()
+            filename = None
+            patch_lines = None
+        elif patch_lines is not None:
+            patch_lines.append(line)
+        elif line.startswith("@@"):
+            patch_lines = [line]
+        elif line.startswith("--- "):
+            # Only kept for deleted files, the new path wins otherwise
+            if line != "--- /dev/null":
+                filename = unquote_path(line[4:].rstrip("\t"))[2:]
+        elif line.startswith("+++ "):
+            if line != "+++ /dev/null":
+                filename = unquote_path(line[4:].rstrip("\t"))[2:]
+
+    add_file()
+    # The output ends with a newline, which GitHub patches do not have
+    for file in files:
+        file["patch"] = file["patch"].rstrip("\n")
+    return files
+
+
+def get_commit_diff(local_repo: git.Repo, commit_sha: str) -> Union[Dict, None]:
+    """
+    Compute the changes of a commit from the local clone, as {"sha", "message", "files"} where the files
+    are those of parse_git_diff. Like GitHub, a commit is compared to its first parent.
+    Only the files with an allowed extension are diffed, so the other blobs are never downloaded.
+    Returns None when the clone does not have the commit.
+    """
+    try:
+        commit = local_repo.commit(commit_sha)
+        parent_sha = commit.parents[0].hexsha if commit.parents else EMPTY_TREE_SHA
+    except (ValueError, BadName, BadObject):
+        return None
+
+    pathspecs = [f"*{extension}" for extension in constants.ALLOWED_FILE_EXTENSIONS]
+    # The options the user's git config could change are given explicitly: parse_git_diff expects the a/ and b/
+    # prefixes, and the hunks must be those of GitHub's patches (3 lines of context, myers) for the comment positions
+    diff_output = local_repo.git(c="core.quotePath=false").diff(
+        parent_sha, commit.hexsha, "--no-color", "--no-ext-diff", "--no-textconv", "--no-relative", "--find-renames",
+        "--src-prefix=a/", "--dst-prefix=b/", "--unified=3", "--inter-hunk-context=0", "--diff-algorithm=myers",
+        "--", *pathspecs,
+        strip_newline_in_stdout=False,
+    )
+    return {"sha": commit.hexsha, "message": commit.message.rstrip("\n"), "files": parse_git_diff(diff_output)}
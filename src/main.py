@@ -1,46 +1,141 @@
+import os
+import re
+import sys
+import time
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
 import helper
 import github_helper
 import constants
 from logger import init_logger
 from function_analyzer import analyze_diff_and_functions
+from symbol_index import release_symbol_indexes
+from dataset_writer import JSONLWriter, get_dataset_file_path
+from pipeline import Pipeline, Stage
+from rate_limiter import create_shared_budget
 
-def create_dataset_for_repo(repo_name: str):
-    repo_path = "../repositories"
-    helper.empty_directory(repo_path)
-    helper.remove_file("user_defined_functions.txt")
+def get_repo_work_dir(repo_name: str) -> str:
+    # Every repository gets its own clone, so that several can be processed at the same time
+    return os.path.join(constants.REPOSITORIES_DIR, repo_name.replace("/", "__"))
+
+def create_dataset_for_repo(repo_name: str) -> int:
+    """
+    Collect the dataset of a repository. Returns the number of code diffs written.
+    """
+    repo_path = get_repo_work_dir(repo_name)
     github_helper.clone_repo_to_path(repo_name, repo_path)
 
     print(f"Repo for which PRs are going to be pulled: {repo_name}\n\n")
     approved_prs = github_helper.fetch_approved_PRs_from_repo(repo_name)
-    diffs_comments_and_commits = github_helper.collect_diffs_comments_and_commits(approved_prs)
+    github_helper.fetch_PR_refs_to_local_repo(approved_prs)
+    dataset_file_path = get_dataset_file_path(os.path.join(constants.DATASET_DIR, repo_name), constants.DATASET_COMPRESSION)
+
+    def analyze_function_calls(code_diff_task: dict) -> dict:
+        item = code_diff_task["code_diff_info"]
+        item['function_analysis'] = analyze_diff_and_functions(item, repo_path)
+        return code_diff_task
+
+    # Each diff flows through the stages as soon as its PR is fetched and is written once, at the end
+    pipeline = Pipeline([
+        Stage("split", github_helper.split_commits_into_code_diffs, flat=True),
+        Stage("comments", github_helper.map_comments_to_code_diff),
+        Stage("function_context", github_helper.add_function_context_to_code_diff_task),
+        Stage("callee_analysis", analyze_function_calls),
+    ])
+    try:
+        with JSONLWriter(dataset_file_path, constants.DATASET_COMPRESSION) as writer:
+            pipeline.run(github_helper.iter_fetched_PRs(approved_prs), lambda code_diff_task: writer.write(code_diff_task["code_diff_info"]))
+    finally:
+        # The worker process may go on with another repository, the mapped files of this one are closed
+        release_symbol_indexes(repo_path)
+
+    return writer.count
+
+
+def init_worker(shared_budget):
+    # Runs once in every worker process
+    github_helper.share_rate_limit_budget(shared_budget)
+    github_helper.authenticate_github()
 
-    helper.write_json_to_file(diffs_comments_and_commits, "../data/diffs_per_repo/" + repo_name + ".json")
+def run_repo(repo_name: str) -> dict:
+    """
+    Create the dataset of a repository and report how it went; a failure does not stop the other repositories.
+    """
+    start_time = time.time()
+    try:
+        github_helper.start_fetch_engine()
+        records = create_dataset_for_repo(repo_name)
+        return {"repo_name": repo_name, "ok": True, "records": records, "seconds": time.time() - start_time}
+    except Exception as e:
+        traceback.print_exc()
+        return {"repo_name": repo_name, "ok": False, "error": f"{type(e).__name__}: {e}", "seconds": time.time() - start_time}
+    finally:
+        # Worker processes go on with other repositories, and never run atexit handlers
+        github_helper.close_fetch_engine()
 
-        # Analyze function calls for each diff
-    for item in diffs_comments_and_commits:
-        function_analysis = analyze_diff_and_functions(item, repo_path)
-        item['function_analysis'] = function_analysis
+def run_repos(repo_names: List[str], workers: int) -> List[dict]:
+    """
+    Process the repositories, `workers` at a time in separate processes. The processes share
+    one core API budget since they use the same access token.
+    """
+    shared_budget = create_shared_budget()
+    results = []
 
-    helper.write_json_to_file(diffs_comments_and_commits, "../data/diffs_per_repo/" + repo_name + ".json")
+    def report(result: dict):
+        results.append(result)
+        progress = f"[{len(results)}/{len(repo_names)}] {result['repo_name']}"
+        if result["ok"]:
+            print(f"{progress}: {result['records']} code diffs in {result['seconds']:.0f}s")
+        else:
+            print(f"{progress}: FAILED after {result['seconds']:.0f}s ({result['error']})")
+
+    if workers <= 1:
+        init_worker(shared_budget)
+        for repo_name in repo_names:
+            report(run_repo(repo_name))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(shared_budget,)) as executor:
+        futures = {executor.submit(run_repo, repo_name): repo_name for repo_name in repo_names}
+        for future in as_completed(futures):
+            try:
+                report(future.result())
+            except Exception as e:
+                # The worker process itself died
+                report({"repo_name": futures[future], "ok": False, "error": f"{type(e).__name__}: {e}", "seconds": 0})
+
+    return results
+
+def select_repo_names(repo_names: List[str], start: int, end: int, indices: List[int], pattern: str) -> List[str]:
+    if indices:
+        repo_names = [repo_names[i] for i in indices]
+    else:
+        repo_names = repo_names[start:end]
+    if pattern:
+        repo_names = [repo_name for repo_name in repo_names if re.search(pattern, repo_name)]
+    return repo_names
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Collect code diffs with their review comments from the repositories of the repo list.")
+    parser.add_argument("--start", type=int, default=0, help="index of the first repository of the list")
+    parser.add_argument("--end", type=int, default=None, help="index after the last repository of the list")
+    parser.add_argument("--indices", type=int, nargs="+", help="indices of the repositories to process, instead of --start/--end")
+    parser.add_argument("--filter", dest="pattern", help="only process the repositories whose name matches this regular expression")
+    parser.add_argument("--workers", type=int, default=constants.REPO_WORKER_COUNT, help="repositories processed at the same time")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     init_logger()
     repo_names = helper.get_repo_names_from_file(constants.REPO_LIST_FILENAME)
-    github_helper.authenticate_github()
+    repo_names = select_repo_names(repo_names, args.start, args.end, args.indices, args.pattern)
 
-    create_dataset_for_repo(repo_names[210])
-    create_dataset_for_repo(repo_names[211])
-    create_dataset_for_repo(repo_names[237])
-    create_dataset_for_repo(repo_names[240])
-    create_dataset_for_repo(repo_names[244])
-    create_dataset_for_repo(repo_names[251])
-    create_dataset_for_repo(repo_names[255])
-    create_dataset_for_repo(repo_names[258])
-    create_dataset_for_repo(repo_names[267])
-    create_dataset_for_repo(repo_names[271])
-    create_dataset_for_repo(repo_names[719])
-    create_dataset_for_repo(repo_names[720])
-
-    # for repo_name in repo_names:
-    #     create_dataset_for_repo(repo_name)
\ No newline at end of file
+    results = run_repos(repo_names, args.workers)
+    failures = [result for result in results if not result["ok"]]
+    print(f"\nProcessed {len(results) - len(failures)} of {len(results)} repositories")
+    for failure in failures:
+        print(f"Failed: {failure['repo_name']} ({failure['error']})")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,59 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, Type, Union
+from github.Requester import Requester
+import constants
+
+# GitHub does not return more than 100 items per page
+MAX_PAGE_SIZE = 100
+
+# Page number of the rel="last" link; `[?&]` keeps per_page from matching
+LAST_PAGE_PATTERN = re.compile(r'<[^>]*[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+
+def get_last_page(headers: Dict[str, str]) -> int:
+    """
+    Number of pages of a paginated response, from its Link header (1 when there is a single page).
+    """
+    link = headers.get("Link", headers.get("link", ""))
+    match = LAST_PAGE_PATTERN.search(link)
+    return int(match.group(1)) if match else 1
+
+
+def iter_paginated(requester: Requester, content_class: Type, url: str, params: Dict = None, before_request: Union[Callable, None] = None) -> Iterator:
+    """
+    Iterate a paginated list of the REST API like PyGithub's PaginatedList, without waiting for a page
+    before requesting the next: the first page gives the number of pages (rel="last" link), the others
+    are then requested by up to PAGE_PREFETCH_WORKERS threads, and the items are yielded in order.
+
+    Pages hold up to 100 items whatever the client's per_page. `before_request` is called before every
+    request (e.g. to wait for the rate limit).
+    """
+    params = {**(params or {}), "per_page": min(requester.per_page, MAX_PAGE_SIZE)}
+
+    def request_page(page: int):
+        if before_request is not None:
+            before_request()
+        page_params = params if page == 1 else {**params, "page": page}
+        return requester.requestJsonAndCheck("GET", url, parameters=page_params)
+
+    headers, data = request_page(1)
+    last_page = get_last_page(headers)
+    yield from to_items(requester, content_class, headers, data)
+    if last_page == 1:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(constants.PAGE_PREFETCH_WORKERS, last_page - 1))
+    try:
+        futures = [executor.submit(request_page, page) for page in range(2, last_page + 1)]
+        for future in futures:
+            headers, data = future.result()
+            yield from to_items(requester, content_class, headers, data)
+    finally:
+        # The pages not requested yet are dropped when the caller stops early
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def to_items(requester: Requester, content_class: Type, headers: Dict, data) -> list:
+    # Like PaginatedList, the items are not completed: their attributes come from the list
+    return [content_class(requester, headers, element, completed=False) for element in data or [] if element is not None]
@@ -0,0 +1,119 @@
+import queue
+import threading
+from typing import Callable, Iterable, List
+
+import constants
+
+# Marks the end of the items in a queue
+END = object()
+
+
+class Stage:
+    """
+    A step of the pipeline. `func` takes an item and returns the next item, or with `flat=True`
+    an iterable of next items (e.g. a commit split into code diffs).
+    Stages with more than one worker do not keep the order of the items.
+    """
+    def __init__(self, name: str, func: Callable, workers: int = 1, flat: bool = False):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.flat = flat
+
+
+class Pipeline:
+    """
+    Runs the stages in their own threads, connected by bounded queues, so that every stage works
+    on a different item at the same time. A full queue blocks the stage before it, which keeps the
+    number of items in flight (and the memory used) bounded.
+
+    The first error raised by a stage stops the source; the items already in flight are dropped
+    and the error is raised again by `run`.
+    """
+    def __init__(self, stages: List[Stage], queue_size: int = constants.PIPELINE_QUEUE_SIZE):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self.stopped = threading.Event()
+        self.error = None
+        self.error_lock = threading.Lock()
+
+    def fail(self, error: BaseException):
+        with self.error_lock:
+            if self.error is None:
+                self.error = error
+        self.stopped.set()
+
+    def feed(self, source: Iterable):
+        try:
+            for item in source:
+                if self.stopped.is_set():
+                    break
+                self.queues[0].put(item)
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            self.queues[0].put(END)
+
+    def work(self, stage: Stage, input_queue: queue.Queue, output_queue: queue.Queue, remaining_workers: List[int], lock: threading.Lock):
+        while True:
+            item = input_queue.get()
+            if item is END:
+                # Let the other workers of the stage see the end too; the last one passes it on
+                input_queue.put(END)
+                with lock:
+                    remaining_workers[0] -= 1
+                    last_worker = remaining_workers[0] == 0
+                if last_worker:
+                    output_queue.put(END)
+                return
+
+            # After an error the items are only drained so that the upstream threads can finish
+            if self.stopped.is_set():
+                continue
+            try:
+                if stage.flat:
+                    for next_item in stage.func(item):
+                        output_queue.put(next_item)
+                else:
+                    output_queue.put(stage.func(item))
+            except BaseException as e:
+                print(f"Pipeline stage {stage.name} failed: {e}")
+                self.fail(e)
+
+    def run(self, source: Iterable, sink: Callable):
+        """
+        Pass the items of `source` through the stages and call `sink` on every item of the last stage,
+        in the calling thread.
+        """
+        threads = [threading.Thread(target=self.feed, args=(source,), name="pipeline-source", daemon=True)]
+        for stage, input_queue, output_queue in zip(self.stages, self.queues, self.queues[1:]):
+            remaining_workers = [stage.workers]
+            lock = threading.Lock()
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self.work,
+                    args=(stage, input_queue, output_queue, remaining_workers, lock),
+                    name=f"pipeline-{stage.name}-{worker}",
+                    daemon=True,
+                ))
+
+        for thread in threads:
+            thread.start()
+
+        output_queue = self.queues[-1]
+        while True:
+            item = output_queue.get()
+            if item is END:
+                break
+            if self.stopped.is_set():
+                continue
+            try:
+                sink(item)
+            except BaseException as e:
+                self.fail(e)
+
+        for thread in threads:
+            thread.join()
+
+        if self.error is not None:
+            raise self.error
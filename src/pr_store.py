@@ -0,0 +1,159 @@
+import os
+import json
+import sqlite3
+import threading
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Union
+
+# Columns of a PR record. review_comments and commits are JSON lists, or NULL when they
+# were not prefetched and have to be fetched from the REST API.
+PR_RECORD_COLUMNS = ["number", "updated_at", "title", "base_repo", "head_sha", "approved", "review_comments", "commits"]
+
+
+def to_row(record: Dict) -> tuple:
+    row = []
+    for column in PR_RECORD_COLUMNS:
+        value = record.get(column)
+        if column in ("review_comments", "commits") and value is not None:
+            value = json.dumps(value)
+        row.append(value)
+    return tuple(row)
+
+
+def to_record(row: tuple) -> Dict:
+    record = dict(zip(PR_RECORD_COLUMNS, row))
+    record["approved"] = bool(record["approved"])
+    for column in ("review_comments", "commits"):
+        if record[column] is not None:
+            record[column] = json.loads(record[column])
+    return record
+
+
+class ApprovedPRStore:
+    """
+    Closed PRs of a repository saved as they are scanned, with the progress of the scan,
+    so that an interrupted scan resumes where it stopped.
+
+    Only the fields the pipeline uses are kept (see PR_RECORD_COLUMNS), as plain columns.
+
+    Scan state keys:
+    - high_watermark: last update time of the newest PR covered by the last completed scan.
+      A new scan stops at PRs that were not updated since.
+    - scan_watermark: last update time of the newest PR of the scan in progress.
+    - scan_cursor: where the scan in progress continues (a REST page cursor, see to_page_cursor, or a GraphQL cursor).
+    """
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scan_state (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pr_records (number INTEGER PRIMARY KEY, updated_at REAL, title TEXT, base_repo TEXT, "
+            "head_sha TEXT, approved INTEGER, review_comments TEXT, commits TEXT)"
+        )
+        self.connection.commit()
+
+    def get_state(self, key: str) -> Union[str, None]:
+        row = self.connection.execute("SELECT value FROM scan_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def save_page(self, pr_records: List[Dict], state: Dict[str, Union[str, float, None]]):
+        """
+        Save the PR records of a scanned page together with the new scan state, in one transaction.
+        """
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO pr_records VALUES ({', '.join('?' * len(PR_RECORD_COLUMNS))})",
+                (to_row(pr_record) for pr_record in pr_records)
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scan_state VALUES (?, ?)",
+                ((key, None if value is None else str(value)) for key, value in state.items())
+            )
+
+    def load_approved_prs(self) -> "PRRecordList":
+        return PRRecordList(self.path)
+
+    def close(self):
+        self.connection.close()
+
+
+class PRRecordList(Sequence):
+    """
+    The approved PR records of a store, newest PRs first like the closed PRs listing.
+    Only the PR numbers are loaded upfront; records are read from the store when accessed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        # sqlite connections cannot be shared between threads
+        self.connections = threading.local()
+        self.numbers = [row[0] for row in self.get_connection().execute("SELECT number FROM pr_records WHERE approved ORDER BY number DESC")]
+
+    def get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self.connections, "connection", None)
+        if connection is None:
+            connection = self.connections.connection = sqlite3.connect(self.path)
+        return connection
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row = self.get_connection().execute(f"SELECT {', '.join(PR_RECORD_COLUMNS)} FROM pr_records WHERE number = ?", (self.numbers[index],)).fetchone()
+        return to_record(row)
+
+    def __iter__(self) -> Iterator[Dict]:
+        cursor = self.get_connection().execute(f"SELECT {', '.join(PR_RECORD_COLUMNS)} FROM pr_records WHERE approved ORDER BY number DESC")
+        for row in cursor:
+            yield to_record(row)
+
+
+def to_page_cursor(page_number: int, page_size: int) -> str:
+    return f"{page_number}/{page_size}"
+
+
+def parse_page_cursor(cursor: Union[str, None], page_size: int) -> int:
+    """
+    Page number (from 0) of a REST scan cursor, for pages of `page_size` PRs. A cursor saved with another
+    page size (a bare page number was saved with PyGithub's default of 30) gives the page holding its
+    first PR, so that resuming never skips PRs.
+    """
+    if cursor is None:
+        return 0
+    page_number, _, cursor_page_size = cursor.partition("/")
+    return int(page_number) * int(cursor_page_size or 30) // page_size
+
+
+def scan_approved_PRs(store: ApprovedPRStore, fetch_page) -> PRRecordList:
+    """
+    Scan the closed PRs, most recently updated first, and return all the approved PRs of the store.
+
+    `fetch_page(cursor)` returns the PR records of a page (see PR_RECORD_COLUMNS), the update times
+    of the oldest and the newest PR of the page, and the cursor of the next page (None after the last one).
+    A new scan starts with a None cursor.
+    """
+    high_watermark = store.get_state("high_watermark")
+    high_watermark = float(high_watermark) if high_watermark is not None else None
+    scan_watermark = store.get_state("scan_watermark")
+    scan_watermark = float(scan_watermark) if scan_watermark is not None else None
+    cursor = store.get_state("scan_cursor")
+    if scan_watermark is not None:
+        print(f"Resuming the scan of closed PRs from {cursor}")
+
+    while True:
+        pr_records, oldest_updated_at, newest_updated_at, next_cursor = fetch_page(cursor)
+        if scan_watermark is None:
+            scan_watermark = newest_updated_at if newest_updated_at is not None else high_watermark
+
+        # PRs older than the watermark were covered by the previous scan
+        done = next_cursor is None or (high_watermark is not None and oldest_updated_at is not None and oldest_updated_at <= high_watermark)
+        if done:
+            store.save_page(pr_records, {"high_watermark": scan_watermark, "scan_watermark": None, "scan_cursor": None})
+            break
+
+        store.save_page(pr_records, {"scan_watermark": scan_watermark, "scan_cursor": next_cursor})
+        cursor = next_cursor
+
+    return store.load_approved_prs()
@@ -0,0 +1,5 @@
+(call_expression
+  function: [
+    (identifier) @call
+    (field_expression field: (field_identifier) @method)
+  ])
@@ -0,0 +1,6 @@
+(call_expression
+  function: [
+    (identifier) @call
+    (field_expression field: (field_identifier) @method)
+    (qualified_identifier name: (identifier) @method)
+  ])
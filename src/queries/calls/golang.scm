@@ -0,0 +1,5 @@
+(call_expression
+  function: [
+    (identifier) @call
+    (selector_expression operand: (_) @receiver field: (field_identifier) @method)
+  ])
@@ -0,0 +1,10 @@
+(method_invocation
+  !object
+  name: (identifier) @call)
+
+(method_invocation
+  object: (_)
+  name: (identifier) @method)
+
+(object_creation_expression
+  type: (type_identifier) @call)
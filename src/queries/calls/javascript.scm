@@ -0,0 +1,8 @@
+(call_expression
+  function: [
+    (identifier) @call
+    (member_expression property: (property_identifier) @method)
+  ])
+
+(new_expression
+  constructor: (identifier) @call)
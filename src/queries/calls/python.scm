@@ -0,0 +1,5 @@
+(call
+  function: [
+    (identifier) @call
+    (attribute attribute: (identifier) @method)
+  ])
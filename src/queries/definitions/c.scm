@@ -0,0 +1,4 @@
+; The name is under a chain of declarators (int **f(void), int (*f(void))(int)), resolved by
+; user_defined_functions.get_declarator_name
+(function_definition
+  declarator: (_) @declarator) @definition.function
@@ -0,0 +1,5 @@
+(method_declaration
+  name: (identifier) @name) @definition.function
+
+(constructor_declaration
+  name: (identifier) @name) @definition.function
@@ -0,0 +1,25 @@
+(function_declaration
+  name: (identifier) @name) @definition.function
+
+(generator_function_declaration
+  name: (identifier) @name) @definition.function
+
+(method_definition
+  name: (property_identifier) @name) @definition.function
+
+(function) @definition.function
+
+(variable_declarator
+  name: (identifier) @name
+  value: [(function) (arrow_function)]) @definition.function
+
+(assignment_expression
+  left: [
+    (identifier) @name
+    (member_expression property: (property_identifier) @name)
+  ]
+  right: [(function) (arrow_function)]) @definition.function
+
+(pair
+  key: (property_identifier) @name
+  value: [(function) (arrow_function)]) @definition.function
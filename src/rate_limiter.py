@@ -0,0 +1,151 @@
+import math
+import threading
+import time
+import multiprocessing
+
+
+class TokenBucket:
+    """
+    Request budget shared by every thread that calls the GitHub API.
+
+    GitHub grants a fixed number of core requests per window, so the bucket holds the
+    requests left in the current window (minus a reserve) and is refilled when the window
+    resets. `sync` aligns it with the budget reported by GitHub.
+    """
+    def __init__(self, reserve: int):
+        self.reserve = reserve
+        # Unknown until the first sync
+        self.tokens = None
+        self.reset_at = 0.0
+        self.lock = threading.Lock()
+
+    def sync(self, remaining: int, reset_at: float):
+        with self.lock:
+            # Responses can arrive out of order; within a window the budget only goes down
+            if self.tokens is None or reset_at > self.reset_at or remaining - self.reserve < self.tokens:
+                self.tokens = remaining - self.reserve
+                self.reset_at = reset_at
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        with self.lock:
+            if self.tokens is None:
+                return True
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def seconds_until_reset(self) -> float:
+        with self.lock:
+            return self.reset_at - time.time()
+
+
+def create_shared_budget():
+    """
+    Shared memory for a SharedTokenBucket: the tokens (NaN until the first sync) and the reset time.
+    Pass it to the worker processes when they are created.
+    """
+    return multiprocessing.Array('d', [math.nan, 0.0])
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket whose budget lives in shared memory, so that processes using the same
+    access token draw from one budget.
+    """
+    def __init__(self, reserve: int, shared_budget):
+        self.reserve = reserve
+        self.shared_budget = shared_budget
+        # Process and thread safe
+        self.lock = shared_budget.get_lock()
+
+    @property
+    def tokens(self):
+        tokens = self.shared_budget[0]
+        return None if math.isnan(tokens) else int(tokens)
+
+    @tokens.setter
+    def tokens(self, tokens):
+        self.shared_budget[0] = math.nan if tokens is None else tokens
+
+    @property
+    def reset_at(self) -> float:
+        return self.shared_budget[1]
+
+    @reset_at.setter
+    def reset_at(self, reset_at: float):
+        self.shared_budget[1] = reset_at
+
+
+class RateLimitGovernor:
+    """
+    Decides before an API call whether to wait for the rate limit to reset.
+
+    PyGithub records the X-RateLimit-* headers of every response, so the budget is taken
+    from there and counted down locally in between. The server is only asked for the
+    rate limit every `refresh_interval` seconds.
+    """
+    def __init__(self, reserve: int, refresh_interval: float, reset_margin: float, bucket: TokenBucket = None):
+        self.bucket = bucket if bucket is not None else TokenBucket(reserve)
+        self.refresh_interval = refresh_interval
+        # Slack for the clock difference with GitHub when sleeping until a reset
+        self.reset_margin = reset_margin
+        self.last_refresh = 0.0
+        self.last_observed = None
+        self.lock = threading.Lock()
+
+    def observe(self, client):
+        """
+        Sync the bucket with the budget reported by the last response, if it changed since the last call.
+        """
+        with self.lock:
+            if time.time() - self.last_refresh >= self.refresh_interval:
+                client.get_rate_limit()
+                self.last_refresh = time.time()
+
+            # Both are read from the headers of the last response
+            remaining, _ = client.rate_limiting
+            observed = (remaining, client.rate_limiting_resettime)
+            if observed == self.last_observed:
+                return
+            self.last_observed = observed
+
+        self.bucket.sync(*observed)
+
+    def wait(self, client):
+        self.observe(client)
+
+        while not self.bucket.try_acquire():
+            reset_time = self.bucket.seconds_until_reset() + self.reset_margin
+            if reset_time > 0:
+                print(f"Rate limit exceeded. Sleeping for {reset_time} seconds.")
+                time.sleep(reset_time)
+            else:
+                print("Negative reset time. Waiting for the rate limit to get reset.")
+                time.sleep(10)
+
+            # The window has reset, ask the server for the new budget
+            with self.lock:
+                self.last_refresh = 0.0
+            self.observe(client)
+
+        return self.bucket.tokens
+
+    def back_off(self, exception):
+        """
+        Sleep after a primary or secondary rate limit error, as long as the response asks to.
+        """
+        headers = {key.lower(): value for key, value in (exception.headers or {}).items()}
+        if "retry-after" in headers:
+            wait_time = float(headers["retry-after"])
+        elif headers.get("x-ratelimit-remaining") == "0" and "x-ratelimit-reset" in headers:
+            wait_time = float(headers["x-ratelimit-reset"]) - time.time() + self.reset_margin
+        else:
+            # Secondary rate limits without a hint, GitHub asks to wait at least a minute
+            wait_time = 60
+
+        wait_time = max(wait_time, 1)
+        print(f"Rate limited by GitHub. Sleeping for {wait_time} seconds.")
+        time.sleep(wait_time)
+        with self.lock:
+            self.last_refresh = 0.0
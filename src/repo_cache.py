@@ -0,0 +1,107 @@
+import os
+import shutil
+from typing import Iterable, List
+import git
+import constants
+
+# refs/pull/N/head refs fetched per git command
+PULL_REFS_PER_FETCH = 100
+
+
+def get_cache_path(repo_name: str) -> str:
+    return os.path.join(constants.REPO_CACHE_DIR, repo_name.replace("/", "__") + ".git")
+
+
+def get_remote_url(repo_name: str) -> str:
+    return constants.GIT_REMOTE_URL.format(repo_name=repo_name)
+
+
+def get_sparse_checkout_patterns() -> List[str]:
+    # Only the source files are read from the working tree (symbol index), the rest is never downloaded
+    return [f"*{extension}" for extension in constants.ALLOWED_FILE_EXTENSIONS]
+
+
+def update_repo_cache(repo_name: str) -> git.Repo:
+    """
+    Return the cached bare clone of a repository, brought up to date with the remote.
+
+    The clone is partial (`--filter=blob:none`): it has every commit and tree but only the
+    file contents that were read at some point, git downloads the others when they are needed.
+    """
+    cache_path = get_cache_path(repo_name)
+    if os.path.isdir(cache_path):
+        bare_repo = git.Repo(cache_path)
+        # GIT_REMOTE_URL may have changed since the clone (e.g. to a local mirror for offline runs)
+        origin = bare_repo.remote("origin")
+        if origin.url != get_remote_url(repo_name):
+            origin.set_url(get_remote_url(repo_name))
+        # A bare clone has no remote-tracking branches, the branches are updated in place
+        bare_repo.git.fetch("origin", "+refs/heads/*:refs/heads/*", prune=True, no_tags=True)
+        print(f"Repository cache of '{repo_name}' updated")
+        return bare_repo
+
+    os.makedirs(constants.REPO_CACHE_DIR, exist_ok=True)
+    bare_repo = git.Repo.clone_from(get_remote_url(repo_name), cache_path, bare=True, multi_options=["--filter=blob:none"])
+    print(f"Repository '{repo_name}' cloned to the cache {cache_path}")
+    return bare_repo
+
+
+def checkout_worktree(bare_repo: git.Repo, worktree_path: str, ref: str = "HEAD") -> git.Repo:
+    """
+    Check `ref` out into `worktree_path`, a worktree of the cached clone limited to the source files.
+    An existing worktree is moved to `ref`; anything else at `worktree_path` is replaced.
+    """
+    commit_sha = bare_repo.commit(ref).hexsha
+    worktree_path = os.path.abspath(worktree_path)
+
+    if os.path.isfile(os.path.join(worktree_path, ".git")):
+        try:
+            worktree = git.Repo(worktree_path)
+            if os.path.samefile(worktree.common_dir, bare_repo.common_dir):
+                sparse_checkout(worktree, commit_sha)
+                return worktree
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError, git.GitCommandError) as e:
+            print(f"Replacing the worktree at {worktree_path}: {e}")
+
+    if os.path.exists(worktree_path):
+        shutil.rmtree(worktree_path)
+    # Forget the worktrees whose directory was removed
+    bare_repo.git.worktree("prune")
+
+    bare_repo.git.worktree("add", "--detach", "--no-checkout", worktree_path, commit_sha)
+    worktree = git.Repo(worktree_path)
+    os.makedirs(os.path.join(worktree.git_dir, "info"), exist_ok=True)
+    with open(os.path.join(worktree.git_dir, "info", "sparse-checkout"), 'w') as sparse_checkout_file:
+        sparse_checkout_file.write("\n".join(get_sparse_checkout_patterns()) + "\n")
+    sparse_checkout(worktree, commit_sha)
+    return worktree
+
+
+def sparse_checkout(worktree: git.Repo, commit_sha: str):
+    """
+    Check a commit out in a worktree, only the files matching its sparse-checkout patterns are written
+    (and their blobs downloaded).
+    """
+    # `git sparse-checkout` would turn on per-worktree config, which GitPython does not read: the bare
+    # clone would no longer be recognized as bare. The setting is passed to the checkout instead.
+    worktree.git(c="core.sparseCheckout=true").checkout(commit_sha, detach=True, force=True)
+
+
+def fetch_pull_request_refs(bare_repo: git.Repo, pr_numbers: Iterable[int]):
+    """
+    Fetch the head commits of the given PRs, so that the commits of PRs opened from forks can be read locally.
+    Only their commits and trees are downloaded.
+    """
+    refspecs = [f"+refs/pull/{pr_number}/head:refs/pull/{pr_number}/head" for pr_number in pr_numbers]
+    for i in range(0, len(refspecs), PULL_REFS_PER_FETCH):
+        try:
+            bare_repo.git.fetch("origin", *refspecs[i:i + PULL_REFS_PER_FETCH], no_tags=True)
+        except git.GitCommandError:
+            # One missing ref fails the whole command, the refs of the batch are fetched one by one
+            for refspec in refspecs[i:i + PULL_REFS_PER_FETCH]:
+                try:
+                    bare_repo.git.fetch("origin", refspec, no_tags=True)
+                except git.GitCommandError as e:
+                    # The files of this PR are fetched with the API instead
+                    print(f"Failed to fetch {refspec}: {e}")
+    print(f"Fetched the refs of {len(refspecs)} PRs")
@@ -0,0 +1,281 @@
+import os
+import re
+import mmap
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import git
+import constants
+from helper import detect_lang_from_extension
+from language_parser import get_parser
+from user_defined_functions import iter_source_files, extract_user_defined_function_spans
+
+# Bumped whenever the content of the persisted index changes
+SYMBOL_INDEX_VERSION = 3
+
+# (file path relative to the repo, start line, end line, start byte, end byte)
+SymbolDefinition = Tuple[str, int, int, int, int]
+
+# Indexes already loaded in this process, keyed by (absolute repo path, commit sha)
+_loaded_indexes = {}
+
+GO_MODULE_LINE = re.compile(r'^module\s+"?([^\s"]+)"?', re.MULTILINE)
+# Last element of a Go import path that is the major version of a module, not the package name
+GO_MAJOR_VERSION = re.compile(r"v[0-9]+")
+
+
+class SymbolIndex:
+    """
+    Maps every user-defined function name of a repository to the places where it is defined.
+    """
+    def __init__(self, repo_path: str, commit_sha: Optional[str], symbols: Dict[str, List[SymbolDefinition]]):
+        self.repo_path = repo_path
+        self.commit_sha = commit_sha
+        self.symbols = symbols
+        # Memory maps of the files sliced last, keyed by relative path, least recently used first.
+        # Every map holds a file descriptor, so at most SYMBOL_INDEX_OPEN_FILES are kept open.
+        self._file_buffers = OrderedDict()
+        self._file_buffers_lock = threading.Lock()
+        # (directory, module path) of the Go modules of the repository, read on first use
+        self._go_modules = None
+        # Directories of the packages imported by each Go file, keyed by relative path
+        self._go_package_directories = {}
+
+    def __contains__(self, function_name: str) -> bool:
+        return function_name in self.symbols
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def get_definitions(self, function_name: str, language: Optional[str] = None, directory: Optional[str] = None) -> List[SymbolDefinition]:
+        """
+        Return the definitions of `function_name`, restricted to the files of `language` and to the files
+        directly in `directory` (relative to the repo) if given.
+        """
+        definitions = self.symbols.get(function_name, [])
+        if language is not None:
+            definitions = [definition for definition in definitions if detect_lang_from_extension(definition[0]) == language]
+        if directory is not None:
+            definitions = [definition for definition in definitions if os.path.dirname(definition[0]) == directory]
+        return definitions
+
+    def has_definition(self, function_name: str, language: Optional[str] = None, directory: Optional[str] = None) -> bool:
+        return bool(self.get_definitions(function_name, language, directory))
+
+    def get_go_package_directories(self, relative_path: str) -> Dict[str, str]:
+        """
+        Return the directories (relative to the repo) of the packages of the repository imported by a Go file,
+        keyed by the name the file calls them with: `utils.Parse()` is a call into the directory of `utils`.
+        """
+        package_directories = self._go_package_directories.get(relative_path)
+        if package_directories is not None:
+            return package_directories
+
+        if self._go_modules is None:
+            self._go_modules = read_go_modules(self.repo_path)
+        try:
+            with open(os.path.join(self.repo_path, relative_path), 'rb') as file:
+                imports = extract_go_imports(file.read())
+        except OSError:
+            # Added by the PR, not in the checked out commit
+            imports = {}
+
+        package_directories = {}
+        for package_name, import_path in imports.items():
+            for module_directory, module_path in self._go_modules:
+                if import_path == module_path or import_path.startswith(module_path + "/"):
+                    package_directory = os.path.join(module_directory, import_path[len(module_path) + 1:])
+                    package_directories[package_name] = package_directory.rstrip(os.sep)
+                    break
+
+        self._go_package_directories[relative_path] = package_directories
+        return package_directories
+
+    def get_file_buffer(self, relative_path: str) -> mmap.mmap:
+        # Called with _file_buffers_lock held, an evicted map must not be closed while another thread slices it
+        file_buffer = self._file_buffers.get(relative_path)
+        if file_buffer is not None:
+            self._file_buffers.move_to_end(relative_path)
+            return file_buffer
+
+        with open(os.path.join(self.repo_path, relative_path), 'rb') as file:
+            file_buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._file_buffers[relative_path] = file_buffer
+        if len(self._file_buffers) > constants.SYMBOL_INDEX_OPEN_FILES:
+            _, evicted_buffer = self._file_buffers.popitem(last=False)
+            evicted_buffer.close()
+        return file_buffer
+
+    def get_function_code(self, function_name: str, language: Optional[str] = None, directory: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Return the code of every definition of `function_name` (see get_definitions) by slicing the mapped
+        source files at the byte offsets recorded in the index.
+        """
+        function_code_data = []
+        for relative_path, _, _, start_byte, end_byte in self.get_definitions(function_name, language, directory):
+            with self._file_buffers_lock:
+                try:
+                    code = self.get_file_buffer(relative_path)[start_byte:end_byte]
+                except (OSError, ValueError) as e:
+                    print(f"Could not read {relative_path}: {e}")
+                    continue
+            function_code_data.append({
+                "code": code.decode('utf-8', errors='replace')
+            })
+        return function_code_data
+
+    def close(self):
+        with self._file_buffers_lock:
+            for file_buffer in self._file_buffers.values():
+                file_buffer.close()
+            self._file_buffers.clear()
+
+
+def extract_go_imports(source: bytes) -> Dict[str, str]:
+    """
+    Return the import paths of a Go file, keyed by the name of the imported package in the file: its alias,
+    or the last element of the path (the one before a major version suffix). Blank and dot imports are left out.
+    """
+    imports = {}
+    tree = get_parser("golang").parse(source)
+    for declaration in tree.root_node.children:
+        if declaration.type != "import_declaration":
+            continue
+
+        for import_spec in declaration.named_children:
+            import_specs = import_spec.named_children if import_spec.type == "import_spec_list" else [import_spec]
+            for import_spec in import_specs:
+                import_path = import_spec.child_by_field_name("path").text.decode('utf-8', errors='replace').strip('"`')
+                name_node = import_spec.child_by_field_name("name")
+                if name_node is None:
+                    path_elements = import_path.split("/")
+                    if len(path_elements) > 1 and GO_MAJOR_VERSION.fullmatch(path_elements[-1]):
+                        path_elements.pop()
+                    imports[path_elements[-1]] = import_path
+                elif name_node.type == "package_identifier":
+                    imports[name_node.text.decode('utf-8', errors='replace')] = import_path
+
+    return imports
+
+
+def read_go_modules(repo_path: str) -> List[Tuple[str, str]]:
+    """
+    Return the (directory relative to the repo, module path) of every go.mod of the commit checked out at `repo_path`,
+    longest module path first. The sparse checkout leaves the go.mod files out, they are read from git.
+    """
+    go_modules = []
+    try:
+        repo = git.Repo(repo_path)
+        for go_mod_path in repo.git.ls_files("--", "go.mod", "*/go.mod").splitlines():
+            match = GO_MODULE_LINE.search(repo.git.show(f"HEAD:{go_mod_path}"))
+            if match:
+                go_modules.append((os.path.dirname(go_mod_path), match.group(1)))
+    except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError, git.exc.GitCommandError):
+        return []
+
+    return sorted(go_modules, key=lambda go_module: len(go_module[1]), reverse=True)
+
+
+def get_repo_commit(repo_path: str) -> Optional[str]:
+    """
+    Return the sha of the commit checked out at `repo_path`, or None if it is not a git repository.
+    """
+    try:
+        return git.Repo(repo_path).head.commit.hexsha
+    except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError, ValueError):
+        return None
+
+
+def get_index_file_path(commit_sha: str) -> str:
+    return os.path.join(constants.SYMBOL_INDEX_DIR, f"{commit_sha}.v{SYMBOL_INDEX_VERSION}.sqlite")
+
+
+def build_symbols(repo_path: str) -> Dict[str, List[SymbolDefinition]]:
+    """
+    Parse every source file of the repository once and collect the spans of its user-defined functions.
+    """
+    symbols = {}
+
+    for file_path in iter_source_files(repo_path):
+        with open(file_path, 'rb') as file:
+            source = file.read()
+
+        relative_path = os.path.relpath(file_path, repo_path)
+        for name, start_line, end_line, start_byte, end_byte in extract_user_defined_function_spans(source, file_path):
+            symbols.setdefault(name, []).append((relative_path, start_line, end_line, start_byte, end_byte))
+
+    return symbols
+
+
+def save_symbols(symbols: Dict[str, List[SymbolDefinition]], index_file: str):
+    """
+    Store the symbols in an SQLite file. The file is written aside and moved in place so that
+    an interrupted run never leaves a partial index behind.
+    """
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    tmp_file = index_file + ".tmp"
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+    connection = sqlite3.connect(tmp_file)
+    try:
+        connection.execute("CREATE TABLE symbols (name TEXT, file TEXT, start_line INTEGER, end_line INTEGER, start_byte INTEGER, end_byte INTEGER)")
+        connection.executemany(
+            "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)",
+            ((name, *definition) for name, definitions in symbols.items() for definition in definitions)
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(tmp_file, index_file)
+
+
+def load_symbols(index_file: str) -> Dict[str, List[SymbolDefinition]]:
+    symbols = {}
+    connection = sqlite3.connect(index_file)
+    try:
+        for name, file_path, start_line, end_line, start_byte, end_byte in connection.execute("SELECT * FROM symbols"):
+            symbols.setdefault(name, []).append((file_path, start_line, end_line, start_byte, end_byte))
+    finally:
+        connection.close()
+
+    return symbols
+
+
+def get_symbol_index(repo_path: str) -> SymbolIndex:
+    """
+    Return the symbol index of the commit checked out at `repo_path`.
+
+    The repository is scanned at most once per commit: the index is kept in memory for the
+    lifetime of the process and persisted under SYMBOL_INDEX_DIR for later runs.
+    """
+    commit_sha = get_repo_commit(repo_path)
+    key = (os.path.abspath(repo_path), commit_sha)
+    if key in _loaded_indexes:
+        return _loaded_indexes[key]
+
+    index_file = get_index_file_path(commit_sha) if commit_sha else None
+    if index_file and os.path.exists(index_file):
+        symbols = load_symbols(index_file)
+        print(f"Loaded symbol index for commit {commit_sha} from {index_file}")
+    else:
+        symbols = build_symbols(repo_path)
+        print(f"Indexed {sum(len(definitions) for definitions in symbols.values())} user-defined functions in {repo_path}")
+        if index_file:
+            save_symbols(symbols, index_file)
+
+    symbol_index = SymbolIndex(repo_path, commit_sha, symbols)
+    _loaded_indexes[key] = symbol_index
+    return symbol_index
+
+
+def release_symbol_indexes(repo_path: str):
+    """
+    Drop the indexes of the repository at `repo_path` loaded by this process and close their mapped files,
+    once the repository is done with (a worker process goes on with other repositories).
+    """
+    repo_path = os.path.abspath(repo_path)
+    for key in [key for key in _loaded_indexes if key[0] == repo_path]:
+        _loaded_indexes.pop(key).close()
@@ -1,49 +1,80 @@
 import os
-import ast
+from typing import Iterator, List, Tuple, Union
+import tree_sitter
+import constants
+from helper import has_allowed_extensions, detect_lang_from_extension
+from language_parser import DEFINITION_QUERY_MAP, get_parser
 
-def extract_user_defined_functions(file_path):
+def is_user_defined_function_name(function_name: str, language: str) -> bool:
     """
-    Extract user-defined function names from a Python file.
+    Python functions keep the original heuristic (an underscore and not a constructor);
+    every named function of the other languages is considered user-defined (their callees are narrowed
+    down by function_analyzer instead).
     """
-    user_defined_functions = []
-    
-    with open(file_path, 'r', encoding='utf-8') as file:
-        try:
-            tree = ast.parse(file.read(), filename=file_path)
-            for node in ast.walk(tree):
-                # Only consider function definitions
-                if isinstance(node, ast.FunctionDef) and node.name != "__init__" and "_" in node.name:
-                    user_defined_functions.append(node.name)
-        except SyntaxError as e:
-            print(f"Syntax error in file {file_path}: {e}")
-    
-    return user_defined_functions
+    if language == "python":
+        return function_name != "__init__" and "_" in function_name
+    return True
 
-def find_user_defined_functions(repo_path, output_file):
+# C/C++ declarators wrapping the declarator of the function name
+WRAPPING_DECLARATORS = ("pointer_declarator", "reference_declarator", "parenthesized_declarator", "function_declarator")
+
+def get_declarator_name(declarator: tree_sitter.Node) -> Union[tree_sitter.Node, None]:
+    """
+    The name node of a C/C++ function definition's declarator, under any chain of pointer, reference and
+    parenthesized declarators. None for names that cannot be called as such (operators, destructors, templates).
+    """
+    node = declarator
+    while node is not None and node.type in WRAPPING_DECLARATORS:
+        # The declarator of a function_declarator is its first child, followed by the parameters
+        node = node.child_by_field_name("declarator") or (node.named_children[-1] if node.named_children else None)
+    while node is not None and node.type == "qualified_identifier":
+        node = node.child_by_field_name("name")
+    if node is None or node.type not in ("identifier", "field_identifier"):
+        return None
+    return node
+
+def extract_user_defined_function_spans(source: bytes, file_path: str) -> List[Tuple[str, int, int, int, int]]:
     """
-    Traverse the repository and find user-defined functions, storing them in a text file.
+    Extract (name, start line, end line, start byte, end byte) of every user-defined function in a source file.
+    Byte offsets point into `source`, so the function code is `source[start_byte:end_byte]`.
     """
-    all_functions = []
+    function_spans = []
+    language = detect_lang_from_extension(file_path)
+    definition_query = DEFINITION_QUERY_MAP.get(language)
+    if definition_query is None:
+        return function_spans
+
+    tree = get_parser(language).parse(source)
+    for _, captures in definition_query.matches(tree.root_node):
+        name_node = captures.get("name")
+        if name_node is None and "declarator" in captures:
+            name_node = get_declarator_name(captures["declarator"])
+        # Anonymous functions cannot be called by name
+        if name_node is None:
+            continue
+
+        name = name_node.text.decode('utf-8', errors='replace')
+        if is_user_defined_function_name(name, language):
+            node = captures["definition.function"]
+            function_spans.append((name, node.start_point[0] + 1, node.end_point[0] + 1, node.start_byte, node.end_byte))
 
+    return function_spans
+
+def iter_source_files(repo_path) -> Iterator[str]:
+    """
+    Yield the paths of the source files of a repository that may hold user-defined functions.
+    """
     # Walk through all files in the repo_path
     for root, dirs, files in os.walk(repo_path):
         # Exclude 'lib' and 'static' directories
         if 'lib' in root.split(os.sep) or 'static' in root.split(os.sep):
             continue
-        
+
         for file_name in files:
-            # Skip __init__.py files and non-Python files
-            if 'init' in file_name or not file_name.endswith('.py'):
+            if not has_allowed_extensions(file_name, constants.ALLOWED_FILE_EXTENSIONS):
+                continue
+            # Skip __init__.py files
+            if file_name.endswith('.py') and 'init' in file_name:
                 continue
-            
-            file_path = os.path.join(root, file_name)
-            user_defined_functions = extract_user_defined_functions(file_path)
-            if user_defined_functions:
-                all_functions.extend(user_defined_functions)
-
-    # Write all function names to the output file
-    with open(output_file, 'w', encoding='utf-8') as out_file:
-        for func_name in all_functions:
-            out_file.write(f"{func_name}\n")
-
-    print(f"Extracted {len(all_functions)} user-defined functions and saved to {output_file}")
+
+            yield os.path.join(root, file_name)
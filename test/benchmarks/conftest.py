@@ -0,0 +1,127 @@
+"""
+Benchmarks of the collection pipeline, run from the repository root with
+
+    python -m pytest test/benchmarks
+
+Every benchmark is timed over a few rounds and its median compared with the baseline stored in
+test/benchmarks/baselines.json: it fails when it is slower than the baseline by more than its threshold.
+After a deliberate performance change, or on a new CI machine, record the baselines again with
+--update-baselines and commit them, so that the timings of every commit are compared with them.
+"""
+import os
+import json
+import time
+import statistics
+import pytest
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Allowed slowdown over the baseline median, 0.5 = 50% slower
+DEFAULT_THRESHOLD = 0.5
+
+# Timings of this run, by benchmark name
+results = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--update-baselines", action="store_true", default=False, help="save the medians of this run as the new baselines")
+    group.addoption("--baseline-threshold", type=float, default=None, help="allowed slowdown over the baselines (0.5 = 50%%), instead of the threshold of each benchmark")
+    group.addoption("--timings-json", default=None, help="write the timings of this run to this file")
+
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINES_FILE):
+        return {}
+    with open(BASELINES_FILE, 'r') as baselines_file:
+        return json.load(baselines_file)
+
+
+class Benchmark:
+    """
+    Times a function: `benchmark(func, *args, **kwargs)` calls it once to warm up, then `rounds` times,
+    and returns the result of the last call. `setup`, when given, is called before every call outside
+    of the timing and returns the arguments, for functions that must not get the same objects twice.
+    """
+    def __init__(self, name: str, config, baselines: dict):
+        self.name = name
+        self.config = config
+        self.baselines = baselines
+
+    def __call__(self, func, *args, setup=None, rounds: int = 5, **kwargs):
+        timings = []
+        result = None
+        for round_number in range(rounds + 1):
+            if setup is not None:
+                args = setup()
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            # The first call fills the caches and is not counted
+            if round_number > 0:
+                timings.append(elapsed)
+
+        median = statistics.median(timings)
+        results[self.name] = {"median": median, "min": min(timings), "max": max(timings), "rounds": rounds}
+        self.check(median)
+        return result
+
+    def check(self, median: float):
+        baseline = self.baselines.get(self.name)
+        if baseline is None or self.config.getoption("update_baselines"):
+            return
+
+        threshold = self.config.getoption("baseline_threshold")
+        if threshold is None:
+            threshold = baseline.get("threshold", DEFAULT_THRESHOLD)
+        results[self.name]["baseline"] = baseline["median"]
+        if median > baseline["median"] * (1 + threshold):
+            pytest.fail(f"{self.name} took {median * 1000:.1f} ms, more than {threshold:.0%} over its baseline of {baseline['median'] * 1000:.1f} ms")
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    return load_baselines()
+
+
+@pytest.fixture
+def benchmark(request, baselines):
+    return Benchmark(request.node.name, request.config, baselines)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def work_dir(tmp_path_factory, run_from_work_dir):
+    # The benchmarks share one tree, the clone cache of a round is reused by the next
+    with run_from_work_dir(tmp_path_factory.mktemp("benchmarks")) as work_dir:
+        yield work_dir
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not results:
+        return
+
+    terminalreporter.section("benchmarks")
+    for name, timing in results.items():
+        line = f"{name:<52} median {timing['median'] * 1000:10.2f} ms   min {timing['min'] * 1000:10.2f} ms"
+        if "baseline" in timing:
+            line += f"   {timing['median'] / timing['baseline']:6.2f}x baseline"
+        terminalreporter.write_line(line)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    if not results:
+        return
+
+    timings_json = config.getoption("timings_json")
+    if timings_json:
+        with open(timings_json, 'w') as timings_file:
+            json.dump(results, timings_file, indent=2, sort_keys=True)
+
+    if config.getoption("update_baselines"):
+        updated_baselines = load_baselines()
+        for name, timing in results.items():
+            threshold = updated_baselines.get(name, {}).get("threshold", DEFAULT_THRESHOLD)
+            updated_baselines[name] = {"median": round(timing["median"], 6), "threshold": threshold}
+        with open(BASELINES_FILE, 'w') as baselines_file:
+            json.dump(updated_baselines, baselines_file, indent=2, sort_keys=True)
+            baselines_file.write("\n")
@@ -0,0 +1,162 @@
+"""
+Synthetic inputs of the benchmarks: source files in every supported language, unified diffs, and a
+git repository with PRs whose GitHub API responses are stored in a replay cassette.
+"""
+import os
+import json
+import random
+import git
+import constants
+from diff_parser import parse_hunks
+from github_replay import CassetteStore, get_request_key
+from local_diff import get_commit_diff
+
+LANGUAGE_EXTENSIONS = {"python": ".py", "javascript": ".js", "java": ".java", "c": ".c", "cpp": ".cpp", "golang": ".go"}
+
+
+def make_function(language: str, i: int, changed: bool) -> str:
+    # f_i calls f_(i-1), so that the callee analysis finds a user-defined function in every hunk
+    call = f"f_{i - 1}(x)" if i > 0 else "x"
+    if language == "python":
+        extra = "    y = y * 2\n" if changed else ""
+        return f"def f_{i}(x):\n    y = {call}\n{extra}    return y + {i}\n"
+    if language == "golang":
+        extra = "\ty = y * 2\n" if changed else ""
+        return f"func f_{i}(x int) int {{\n\ty := {call}\n{extra}\treturn y + {i}\n}}\n"
+    if language == "javascript":
+        extra = "  y = y * 2;\n" if changed else ""
+        return f"function f_{i}(x) {{\n  let y = {call};\n{extra}  return y + {i};\n}}\n"
+    indent = "    " * (2 if language == "java" else 1)
+    extra = f"{indent}y = y * 2;\n" if changed else ""
+    signature = f"static int f_{i}(int x)" if language == "java" else f"int f_{i}(int x)"
+    return f"{indent[4:]}{signature} {{\n{indent}int y = {call};\n{extra}{indent}return y + {i};\n{indent[4:]}}}\n"
+
+
+def make_source(language: str, function_count: int, changed=frozenset()) -> str:
+    """
+    A file of `function_count` functions; those in `changed` have one more line.
+    """
+    functions = "\n".join(make_function(language, i, i in changed) for i in range(function_count))
+    if language == "java":
+        return f"public class Synthetic {{\n{functions}}}\n"
+    if language == "golang":
+        return f"package main\n\n{functions}"
+    return functions
+
+
+def make_patch(hunk_count: int, lines_per_hunk: int = 8) -> str:
+    """
+    The patch of a file (as in a GitHub commit) with `hunk_count` hunks, each replacing two lines.
+    """
+    hunks = []
+    for i in range(hunk_count):
+        start = 1 + i * (lines_per_hunk + 20)
+        context = [f" context line {start + j}" for j in range(lines_per_hunk - 4)]
+        body = context[:len(context) // 2] + [f"-old line {i}a", f"-old line {i}b", f"+new line {i}a", f"+new line {i}b"] + context[len(context) // 2:]
+        hunks.append(f"@@ -{start},{lines_per_hunk - 2} +{start},{lines_per_hunk - 2} @@ def function_{i}(x):\n" + "\n".join(body))
+    return "\n".join(hunks)
+
+
+def make_review_comments(commit_sha: str, file_name: str, patch: str, per_hunk: int = 2) -> list:
+    """
+    Review comment records (see github_helper.to_review_comment_record) on the new lines of a patch,
+    and one outdated comment located by its original line only.
+    """
+    review_comments = []
+    for hunk in parse_hunks(patch):
+        commented_lines = [(n, line) for n, line in enumerate(hunk.new_line_numbers, start=1) if line is not None][:per_hunk]
+        for n, line in commented_lines:
+            review_comments.append({"body": f"comment {len(review_comments)}", "position": hunk.position + n, "line": line, "original_line": line,
+                                    "side": "RIGHT", "file_name": file_name, "commit_id": commit_sha, "original_commit_id": commit_sha})
+    review_comments.append({"body": "outdated comment", "position": None, "line": None, "original_line": 1, "side": "RIGHT",
+                            "file_name": file_name, "commit_id": "f" * 40, "original_commit_id": commit_sha})
+    return review_comments
+
+
+def create_synthetic_repo(path: str, pr_count: int = 20, function_count: int = 40, seed: int = 0) -> list:
+    """
+    Create a repository with a file per language and one commit per PR, each changing a few functions
+    of a few files. Returns the PRs as {"number", "title", "sha"}, oldest first.
+    """
+    rng = random.Random(seed)
+    repo = git.Repo.init(path)
+    repo.git.symbolic_ref("HEAD", "refs/heads/main")
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Benchmark")
+        config.set_value("user", "email", "benchmark@example.com")
+
+    changed_functions = {language: set() for language in LANGUAGE_EXTENSIONS}
+
+    def write_files(languages):
+        for language in languages:
+            file_path = os.path.join(path, "src", f"module{LANGUAGE_EXTENSIONS[language]}")
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w') as source_file:
+                source_file.write(make_source(language, function_count, changed_functions[language]))
+        repo.git.add("-A")
+
+    write_files(LANGUAGE_EXTENSIONS)
+    repo.git.commit("-m", "Initial commit")
+
+    prs = []
+    for number in range(1, pr_count + 1):
+        languages = rng.sample(sorted(LANGUAGE_EXTENSIONS), 3)
+        for language in languages:
+            changed_functions[language] ^= set(rng.sample(range(function_count), 4))
+        write_files(languages)
+        repo.git.commit("-m", f"Change {', '.join(languages)} functions (#{number})")
+        prs.append({"number": number, "title": f"Synthetic PR {number}", "sha": repo.head.commit.hexsha})
+    return prs
+
+
+def create_remote(repo_path: str, remote_path: str, prs: list):
+    """
+    Bare clone of the repository to clone from (GIT_REMOTE_URL), with the refs/pull/<number>/head refs of GitHub.
+    """
+    remote = git.Repo.clone_from(repo_path, remote_path, bare=True)
+    for pr in prs:
+        remote.git.update_ref(f"refs/pull/{pr['number']}/head", pr["sha"])
+    return remote
+
+
+def create_cassette(cassette_path: str, repo_path: str, repo_name: str, prs: list) -> CassetteStore:
+    """
+    Record the REST responses a run over the synthetic repository needs (PR_FETCH_BACKEND = "rest"):
+    the closed PRs, all approved, their reviews and review comments on their commit.
+    """
+    cassette = CassetteStore(cassette_path)
+    api_url = constants.GITHUB_UPSTREAM_URL
+    repo_url = f"{api_url}/repos/{repo_name}"
+    local_repo = git.Repo(repo_path)
+
+    def save(path: str, data):
+        cassette.save(get_request_key("GET", path), 200, {"Content-Type": "application/json"}, json.dumps(data).encode('utf-8'))
+
+    save("/user", {"login": "benchmark", "url": f"{api_url}/users/benchmark"})
+    save(f"/repos/{repo_name}", {"full_name": repo_name, "name": repo_name.split("/")[1], "url": repo_url})
+
+    pulls = []
+    for pr in sorted(prs, key=lambda pr: pr["number"], reverse=True):
+        pull_url = f"{repo_url}/pulls/{pr['number']}"
+        pulls.append({
+            "number": pr["number"],
+            "title": pr["title"],
+            "updated_at": f"2024-01-01T00:{pr['number'] // 60:02d}:{pr['number'] % 60:02d}Z",
+            "url": pull_url,
+            "head": {"sha": pr["sha"]},
+            "base": {"repo": {"full_name": repo_name, "url": repo_url}},
+        })
+        save(f"/repos/{repo_name}/pulls/{pr['number']}/reviews?per_page=100", [{"id": 1, "state": "APPROVED"}])
+
+        review_comments = []
+        for file in get_commit_diff(local_repo, pr["sha"])["files"]:
+            review_comments.extend(make_review_comments(pr["sha"], file["filename"], file["patch"]))
+        save(f"/repos/{repo_name}/pulls/{pr['number']}/comments?per_page=100", [
+            {"id": i, "body": comment["body"], "position": comment["position"], "line": comment["line"], "original_line": comment["original_line"],
+             "side": comment["side"], "path": comment["file_name"], "commit_id": comment["commit_id"], "original_commit_id": comment["original_commit_id"],
+             "url": f"{pull_url}/comments/{i}"}
+            for i, comment in enumerate(review_comments)
+        ])
+
+    save(f"/repos/{repo_name}/pulls?direction=desc&per_page=100&sort=updated&state=closed", pulls)
+    return cassette
@@ -0,0 +1,34 @@
+import pytest
+from helper import extract_code_diffs, extract_function_from_full_content
+from diff_parser import parse_hunks
+from comment_mapping import CommentIndex, FileHunkIndex
+from synthetic import LANGUAGE_EXTENSIONS, make_source, make_patch, make_review_comments
+
+
+def test_extract_code_diffs(benchmark):
+    patch = make_patch(5000)
+    code_diffs = benchmark(extract_code_diffs, patch)
+    assert len(code_diffs) == 5000
+
+
+@pytest.mark.parametrize("language", sorted(LANGUAGE_EXTENSIONS))
+def test_extract_function_from_full_content(benchmark, language):
+    function_count = 500
+    code = make_source(language, function_count)
+    # A diff in the middle of the file, over three functions
+    start_line = len(code.splitlines()) // 2
+    functions = benchmark(extract_function_from_full_content, code, start_line, start_line + 10, language)
+    assert "f_" in functions
+
+
+def test_map_comments_to_hunks(benchmark):
+    patch = make_patch(2000)
+    review_comments = make_review_comments("0" * 40, "src/module.py", patch, per_hunk=3)
+
+    def setup():
+        # assign_comments is computed once per file, every round needs new indexes
+        comment_index = CommentIndex(review_comments)
+        return FileHunkIndex(parse_hunks(patch)), comment_index.get_comments("0" * 40, "src/module.py")
+
+    assigned_comments = benchmark(FileHunkIndex.assign_comments, setup=setup)
+    assert sum(len(hunk_comments) for hunk_comments in assigned_comments) == len(review_comments)
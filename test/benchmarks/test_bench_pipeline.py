@@ -0,0 +1,76 @@
+import os
+import json
+import shutil
+import git
+import pytest
+import constants
+import github_helper
+import main
+from local_diff import get_commit_diff
+from function_analyzer import analyze_diff_and_functions
+from github_replay import GitHubStandIn
+from synthetic import create_synthetic_repo, create_remote, create_cassette
+
+REPO_NAME = "benchmark/synthetic"
+
+
+@pytest.fixture(scope="session")
+def synthetic_repo(tmp_path_factory):
+    """
+    The synthetic repository, its remote (GIT_REMOTE_URL) and the cassette of its API responses.
+    """
+    root = tmp_path_factory.mktemp("synthetic")
+    repo_path = str(root / "repo")
+    prs = create_synthetic_repo(repo_path)
+    remotes_dir = root / "remotes"
+    create_remote(repo_path, str(remotes_dir / f"{REPO_NAME}.git"), prs)
+    cassette = create_cassette(str(root / "cassette.sqlite"), repo_path, REPO_NAME, prs)
+    yield {"path": repo_path, "prs": prs, "remote_url": f"file://{remotes_dir}/{{repo_name}}.git", "cassette": cassette}
+    cassette.close()
+
+
+def test_analyze_diff_and_functions(benchmark, synthetic_repo):
+    local_repo = git.Repo(synthetic_repo["path"])
+    code_diffs = []
+    for pr in synthetic_repo["prs"]:
+        for file in get_commit_diff(local_repo, pr["sha"])["files"]:
+            code_diffs.append({"file_name": file["filename"], "code_diff": file["patch"]})
+
+    def analyze_code_diffs():
+        return [analyze_diff_and_functions(code_diff, synthetic_repo["path"]) for code_diff in code_diffs]
+
+    analyses = benchmark(analyze_code_diffs)
+    assert all(analysis["function_calls"] for analysis in analyses)
+
+
+def test_create_dataset_offline(benchmark, synthetic_repo, monkeypatch):
+    # Every round starts from the clone cache of the previous one, like a rerun
+    server = GitHubStandIn("replay", synthetic_repo["cassette"])
+    server.start()
+    monkeypatch.setenv("GITHUB_ACCESS_TOKEN", "offline")
+    monkeypatch.setattr(constants, "GITHUB_API_URL", server.base_url)
+    monkeypatch.setattr(constants, "GIT_REMOTE_URL", synthetic_repo["remote_url"])
+    monkeypatch.setattr(constants, "PR_FETCH_BACKEND", "rest")
+    monkeypatch.setattr(constants, "FETCH_ENGINE", "threads")
+    monkeypatch.setattr(constants, "HTTP_CACHE_DIR", None)
+    github_helper.authenticate_github()
+    assert github_helper.auth is not None
+
+    def setup():
+        # The PRs are scanned again and the dataset written again in every round
+        shutil.rmtree(os.path.join("..", "saved_objs", REPO_NAME), ignore_errors=True)
+        return (REPO_NAME,)
+
+    try:
+        code_diff_count = benchmark(main.create_dataset_for_repo, setup=setup, rounds=3)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert not server.missed_keys
+    assert code_diff_count > 0
+    dataset_file_path = os.path.join(constants.DATASET_DIR, f"{REPO_NAME}.jsonl")
+    with open(dataset_file_path, 'r') as dataset_file:
+        code_diffs = [json.loads(line) for line in dataset_file]
+    assert len(code_diffs) == code_diff_count
+    assert all(code_diff["comments"] for code_diff in code_diffs)
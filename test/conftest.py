@@ -0,0 +1,33 @@
+"""
+Setup shared by the unit tests (test/unit) and the benchmarks (test/benchmarks): the modules of src/
+are importable, and the tests run from a src/ directory of a temporary tree.
+"""
+import os
+import sys
+import contextlib
+import pytest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+
+
+@contextlib.contextmanager
+def enter_work_dir(tmp_dir):
+    """
+    Run from a src/ directory of a temporary tree: the paths of constants.py ("../saved_objs", "../repositories", ...)
+    then point into it instead of the repository.
+    """
+    work_dir = tmp_dir / "src"
+    work_dir.mkdir()
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        yield work_dir
+    finally:
+        os.chdir(previous_dir)
+
+
+@pytest.fixture(scope="session")
+def run_from_work_dir():
+    # The unit tests get a work directory each, the benchmarks share one
+    return enter_work_dir
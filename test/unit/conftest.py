@@ -0,0 +1,15 @@
+"""
+Unit tests of the collection pipeline, run from the repository root with
+
+    python -m pytest test/unit
+
+They need no token or network: the GitHub API is a local server and the remotes are file:// URLs.
+"""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, run_from_work_dir):
+    # Every test runs from a tree of its own
+    with run_from_work_dir(tmp_path) as work_dir:
+        yield work_dir
@@ -0,0 +1,90 @@
+from diff_parser import parse_hunks
+from comment_mapping import CommentIndex, FileHunkIndex
+
+COMMIT = "a" * 40
+EARLIER_COMMIT = "b" * 40
+
+# Two hunks: lines 3-5 of the old file become 3-6 of the new one, old line 20 becomes new line 21
+PATCH = (
+    "@@ -3,3 +3,4 @@ def f():\n"
+    " a\n"
+    "-b\n"
+    "+b2\n"
+    "+b3\n"
+    " c\n"
+    "@@ -20 +21 @@ def g():\n"
+    "-x\n"
+    "+y"
+)
+
+
+def make_comment(body, position=None, line=None, original_line=None, side="RIGHT", commit_id=COMMIT, original_commit_id=COMMIT, file_name="m.py"):
+    return {"body": body, "position": position, "line": line, "original_line": original_line, "side": side,
+            "file_name": file_name, "commit_id": commit_id, "original_commit_id": original_commit_id}
+
+
+def assign(review_comments, commit_id=COMMIT, patch=PATCH):
+    comments = CommentIndex(review_comments).get_comments(commit_id, "m.py")
+    return FileHunkIndex(parse_hunks(patch)).assign_comments(comments)
+
+
+def test_comments_are_located_by_line():
+    assigned = assign([make_comment("on b3", position=4, line=5), make_comment("on y", position=8, line=21)])
+
+    assert assigned == [[{"comment": "on b3", "position": 4, "line": 5}], [{"comment": "on y", "position": 8, "line": 21}]]
+
+
+def test_line_wins_over_a_position_of_another_diff():
+    # In a PR of several commits the position counts lines of the PR diff, not of this commit's patch
+    assigned = assign([make_comment("on c", position=8, line=6)])
+
+    assert assigned == [[{"comment": "on c", "position": 8, "line": 6}], []]
+
+
+def test_left_side_comments_are_located_by_old_line():
+    assigned = assign([make_comment("on removed b", line=4, side="LEFT"), make_comment("on removed x", line=20, side="LEFT")])
+
+    assert assigned == [[{"comment": "on removed b", "position": None, "line": None}], [{"comment": "on removed x", "position": None, "line": None}]]
+
+
+def test_comments_outside_the_hunks_are_left_out():
+    assigned = assign([make_comment("unchanged line", line=12), make_comment("unchanged old line", line=12, side="LEFT")])
+
+    assert assigned == [[], []]
+
+
+def test_records_without_line_are_located_by_position():
+    # Saved before the line was fetched
+    assigned = assign([{"body": "old record", "position": 3, "file_name": "m.py", "commit_id": COMMIT}])
+
+    assert assigned == [[{"comment": "old record", "position": 3, "line": 4}], []]
+
+
+def test_outdated_comments_are_indexed_under_their_original_commit():
+    outdated = make_comment("outdated", original_line=21, commit_id=COMMIT, original_commit_id=EARLIER_COMMIT)
+    comment_index = CommentIndex([outdated, make_comment("current", line=3)])
+
+    assert comment_index.get_commit_ids() == [EARLIER_COMMIT, COMMIT]
+    assert [comment.body for comment in comment_index.get_comments(COMMIT, "m.py")] == ["current"]
+    # original_line is a line of the earlier commit, matched against the hunks of its patch
+    assert assign([outdated], commit_id=EARLIER_COMMIT) == [[], [{"comment": "outdated", "position": None, "line": 21}]]
+
+
+def test_outdated_comments_without_original_commit_are_not_matched_to_another_commit():
+    assigned = assign([make_comment("outdated", original_line=4, original_commit_id=None)])
+
+    assert assigned == [[], []]
+
+
+def test_comments_without_line_or_position_go_to_every_hunk():
+    assigned = assign([{"body": "general", "position": None, "line": None, "original_line": None, "file_name": "m.py", "commit_id": COMMIT}])
+
+    assert assigned == [[{"comment": "general", "position": None, "line": None}]] * 2
+
+
+def test_comments_of_a_file_are_sorted_by_line():
+    comment_index = CommentIndex([make_comment("third", line=21), make_comment("first", line=3), make_comment("second", line=5),
+                                  make_comment("other file", line=1, file_name="n.py")])
+
+    assert [comment.body for comment in comment_index.get_comments(COMMIT, "m.py")] == ["first", "second", "third"]
+    assert len(comment_index) == 4
@@ -0,0 +1,89 @@
+from diff_parser import parse_hunks, parse_hunk_header
+from helper import extract_code_diffs
+
+
+def test_single_line_hunk_headers_have_a_length_of_one():
+    hunk = parse_hunk_header("@@ -5 +5 @@ def f():")
+
+    assert (hunk.old_start, hunk.old_length, hunk.new_start, hunk.new_length) == (5, 1, 5, 1)
+    assert hunk.header == "@@ -5 +5 @@"
+    assert hunk.section == " def f():"
+    assert hunk.new_end == 5
+
+
+def test_empty_ranges():
+    # A new file and a deleted file
+    added, = parse_hunks("@@ -0,0 +1,2 @@\n+a\n+b")
+    removed, = parse_hunks("@@ -1,2 +0,0 @@\n-a\n-b")
+
+    assert (added.new_start, added.new_end, added.added_lines) == (1, 2, [1, 2])
+    assert (removed.new_length, removed.removed_lines, removed.new_line_numbers) == (0, [1, 2], [None, None])
+
+
+def test_no_newline_markers_take_a_position_but_no_line():
+    patch = (
+        "@@ -1,2 +1,2 @@\n"
+        " a\n"
+        "-b\n"
+        "\\ No newline at end of file\n"
+        "+c\n"
+        "\\ No newline at end of file"
+    )
+
+    hunk, = parse_hunks(patch)
+
+    assert hunk.lines[-1] == "\\ No newline at end of file"
+    assert hunk.new_line_numbers == [1, None, None, 2, None]
+    assert (hunk.added_lines, hunk.removed_lines, hunk.context_lines) == ([2], [2], [1])
+    assert hunk.new_end == 2
+
+
+def test_positions_count_every_line_from_the_first_header():
+    patch = (
+        "@@ -1,2 +1,2 @@ first\n"
+        "-a\n"
+        "+b\n"
+        " c\n"
+        "\\ No newline at end of file\n"
+        "@@ -10 +10 @@ second\n"
+        "-x\n"
+        "+y"
+    )
+
+    first, second = parse_hunks(patch)
+
+    assert first.position == 0
+    assert first.body == "-a\n+b\n c\n\\ No newline at end of file"
+    # The second header is the 5th line after the first one
+    assert second.position == 5
+    assert second.new_line_numbers == [None, 10]
+
+
+def test_patch_with_and_without_a_trailing_newline():
+    patch = "@@ -1 +1 @@\n-a\n+b\n@@ -3 +3 @@\n-c\n+d"
+
+    assert [(hunk.header, hunk.body) for hunk in parse_hunks(patch + "\n")] == [(hunk.header, hunk.body) for hunk in parse_hunks(patch)]
+    assert parse_hunks(patch)[-1].body == "-c\n+d"
+    assert extract_code_diffs(patch) == [("@@ -1 +1 @@", "-a\n+b"), ("@@ -3 +3 @@", "-c\n+d")]
+
+
+def test_positions_start_again_for_every_file_of_a_git_diff():
+    diff_output = (
+        "diff --git a/one.py b/one.py\n"
+        "--- a/one.py\n"
+        "+++ b/one.py\n"
+        "@@ -1 +1 @@\n"
+        "-a\n"
+        "+b\n"
+        "diff --git a/two.py b/two.py\n"
+        "--- a/two.py\n"
+        "+++ b/two.py\n"
+        "@@ -1 +1,2 @@\n"
+        " a\n"
+        "+b\n"
+    )
+
+    one, two = parse_hunks(diff_output)
+
+    assert one.body == "-a\n+b"
+    assert (two.position, two.body) == (0, " a\n+b")
@@ -0,0 +1,71 @@
+import os
+import git
+import pytest
+from function_analyzer import extract_function_calls, analyze_diff_and_functions
+from symbol_index import extract_go_imports, release_symbol_indexes
+
+GO_FILES = {
+    "go.mod": "module example.com/project\n\ngo 1.21\n",
+    "internal/utils/parse.go": "package utils\n\nfunc Parse(s string) int {\n\treturn len(s)\n}\n",
+    "internal/strutil/v2/join.go": "package strutil\n\nfunc Join(s string) string {\n\treturn s\n}\n",
+    "cmd/server/main.go": (
+        "package main\n\n"
+        "import (\n\t\"fmt\"\n\t\"example.com/project/internal/utils\"\n\tsu \"example.com/project/internal/strutil/v2\"\n)\n\n"
+        "func local() {}\n\n"
+        "func main() {\n\tlocal()\n\tfmt.Println(utils.Parse(\"a\"), su.Join(\"b\"))\n}\n"
+    ),
+    # Not imported by main.go: its Parse must not be taken for utils.Parse
+    "tools/parse.go": "package tools\n\nfunc Parse(s string) int {\n\treturn 0\n}\n",
+}
+
+CODE_DIFF = (
+    "@@ -10,4 +10,4 @@ func local() {}\n"
+    " func main() {\n"
+    " \tlocal()\n"
+    "-\tfmt.Println(utils.Parse(\"\"))\n"
+    "+\tfmt.Println(utils.Parse(\"a\"), su.Join(\"b\"))\n"
+)
+
+
+@pytest.fixture
+def go_repo(tmp_path):
+    repo = git.Repo.init(tmp_path / "project")
+    for file_name, content in GO_FILES.items():
+        file_path = tmp_path / "project" / file_name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+    repo.index.add(list(GO_FILES))
+    actor = git.Actor("Test", "test@example.com")
+    repo.index.commit("Initial commit", author=actor, committer=actor)
+    # As in the sparse worktrees, only the source files are checked out
+    os.remove(tmp_path / "project" / "go.mod")
+    yield repo.working_tree_dir
+    release_symbol_indexes(repo.working_tree_dir)
+
+
+def test_extract_go_imports():
+    source = (
+        b"package main\n\nimport \"fmt\"\n\nimport (\n\tu \"example.com/project/internal/utils\"\n"
+        b"\t\"example.com/project/internal/strutil/v2\"\n\t_ \"embed\"\n\t. \"strings\"\n)\n"
+    )
+
+    assert extract_go_imports(source) == {
+        "fmt": "fmt",
+        "u": "example.com/project/internal/utils",
+        "strutil": "example.com/project/internal/strutil/v2",
+    }
+
+
+def test_go_package_calls_keep_their_receiver():
+    function_calls, method_calls = extract_function_calls(CODE_DIFF, "golang")
+
+    assert function_calls == {"local"}
+    assert method_calls == {"Println": {"fmt"}, "Parse": {"utils"}, "Join": {"su"}}
+
+
+def test_go_package_calls_are_resolved_in_the_imported_package(go_repo):
+    analysis = analyze_diff_and_functions({"file_name": "cmd/server/main.go", "code_diff": CODE_DIFF}, go_repo)
+
+    assert sorted(analysis["function_calls"]) == ["Join", "Parse", "local"]
+    assert analysis["extracted_code"]["Parse"] == [{"code": "func Parse(s string) int {\n\treturn len(s)\n}"}]
+    assert analysis["extracted_code"]["Join"] == [{"code": "func Join(s string) string {\n\treturn s\n}"}]
@@ -0,0 +1,96 @@
+import json
+import asyncio
+import threading
+import types
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import git
+import pytest
+from github import Github, UnknownObjectException
+import github_helper
+
+REPO_NAME = "owner/project"
+# Force-pushed away and garbage collected: neither the clone nor GitHub has it
+MISSING_SHA = "f" * 40
+
+
+class MissingCommitHandler(BaseHTTPRequestHandler):
+    """
+    The API of a repository without any commit: every commit request gets a 404.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = json.dumps({"message": "Not Found", "documentation_url": "https://docs.github.com/rest"}).encode('utf-8')
+        self.send_response(404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MissingCommitHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def repo(server, monkeypatch):
+    repo = Github(base_url=f"http://127.0.0.1:{server.server_address[1]}", retry=None).get_repo(REPO_NAME, lazy=True)
+    monkeypatch.setattr(github_helper, "get_repo", lambda repo_name: repo)
+    monkeypatch.setattr(github_helper, "monitor_rate_limit", lambda: None)
+    return repo
+
+
+@pytest.fixture
+def local_commit_sha(tmp_path, monkeypatch):
+    """
+    A clone with one commit, used by github_helper as the local clone of the repository.
+    """
+    local_repo = git.Repo.init(tmp_path / "clone")
+    (tmp_path / "clone" / "module.py").write_text("def f():\n    return 1\n")
+    local_repo.index.add(["module.py"])
+    actor = git.Actor("Test", "test@example.com")
+    commit_sha = local_repo.index.commit("Add f", author=actor, committer=actor).hexsha
+    monkeypatch.setattr(github_helper, "local_repo_path", local_repo.working_tree_dir)
+    return commit_sha
+
+
+def make_pr_record(commit_shas: list) -> dict:
+    return {
+        "number": 1,
+        "title": "Change f",
+        "base_repo": REPO_NAME,
+        "review_comments": [
+            {"body": f"Comment on {commit_sha}", "position": 1, "line": 1, "original_line": 1, "side": "RIGHT",
+             "file_name": "module.py", "commit_id": commit_sha, "original_commit_id": commit_sha}
+            for commit_sha in commit_shas
+        ],
+        # More commits than the record could hold, the commented ones are looked up by sha
+        "commits": None,
+    }
+
+
+def test_comments_on_a_missing_commit_are_skipped(repo, server, local_commit_sha):
+    pr_commits = github_helper.fetch_PR_commits(make_pr_record([local_commit_sha, MISSING_SHA]), 1, 1)
+
+    assert [commit["sha"] for commit in pr_commits["commits"]] == [local_commit_sha]
+    assert server.requests == [f"/repos/{REPO_NAME}/commits/{MISSING_SHA}"]
+
+
+def test_missing_commit_is_skipped_by_the_asyncio_engine(repo, local_commit_sha, monkeypatch):
+    async def get_commit(repo_name, commit_sha):
+        raise UnknownObjectException(404, {"message": "Not Found"}, {})
+
+    monkeypatch.setattr(github_helper, "fetch_engine", types.SimpleNamespace(client=types.SimpleNamespace(get_commit=get_commit)))
+    pr_commits = asyncio.run(github_helper.fetch_PR_commits_async(make_pr_record([MISSING_SHA, local_commit_sha]), 1, 1))
+
+    assert [commit["sha"] for commit in pr_commits["commits"]] == [local_commit_sha]
@@ -0,0 +1,96 @@
+import os
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from github import Github
+from github.Requester import Requester
+from github_transport import PooledHTTPConnection, install_pooled_connections
+
+
+class ConditionalHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /user with an ETag (its header name as the server's `etag_header`), and 304 to a matching If-None-Match.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("X-RateLimit-Remaining", str(4999 - len(self.server.requests)))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = json.dumps({"login": "octocat", "url": f"http://127.0.0.1:{self.server.server_address[1]}/user"}).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header(self.server.etag_header, '"v1"')
+        self.send_header("X-RateLimit-Remaining", str(4999 - len(self.server.requests)))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(params=["ETag", "etag"])
+def server(request):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ConditionalHandler)
+    server.requests = []
+    server.etag_header = request.param
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    cache_dir = str(tmp_path / "http_cache")
+    install_pooled_connections(cache_dir)
+    yield cache_dir
+    install_pooled_connections(None)
+    Requester.resetConnectionClasses()
+
+
+def get(server, path: str = "/user"):
+    connection = PooledHTTPConnection("127.0.0.1", server.server_address[1])
+    connection.request("GET", path, None, {"Accept": "application/vnd.github+json"})
+    return connection.getresponse()
+
+
+def count_cache_files(cache_dir: str) -> int:
+    return sum(len(files) for _, _, files in os.walk(cache_dir))
+
+
+def test_304_is_served_from_the_cache(server, cache_dir):
+    first = get(server)
+    second = get(server)
+
+    assert count_cache_files(cache_dir) == 1
+    assert "If-None-Match" not in server.requests[0]
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert (second.status, second.text) == (200, first.text)
+    # The rate limit headers are those of the 304
+    assert second.headers["X-RateLimit-Remaining"] == "4997"
+    assert second.headers["ETag"] == '"v1"'
+
+
+def test_conditional_requests_of_the_caller_are_not_cached(server, cache_dir):
+    connection = PooledHTTPConnection("127.0.0.1", server.server_address[1])
+    connection.request("GET", "/user", None, {"If-None-Match": '"v1"'})
+
+    assert connection.getresponse().status == 304
+    assert count_cache_files(cache_dir) == 0
+
+
+def test_github_client_reads_304s_from_the_cache(server, cache_dir):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    logins = [Github("token", base_url=base_url, seconds_between_requests=None).get_user().login for _ in range(2)]
+
+    assert logins == ["octocat", "octocat"]
+    assert [request.get("If-None-Match") for request in server.requests] == [None, '"v1"']
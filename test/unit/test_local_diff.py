@@ -0,0 +1,48 @@
+import os
+import git
+from local_diff import get_commit_diff, parse_git_diff
+
+
+def commit_file(repo: git.Repo, file_name: str, content: str) -> str:
+    with open(os.path.join(repo.working_tree_dir, file_name), 'w') as file:
+        file.write(content)
+    repo.index.add([file_name])
+    actor = git.Actor("Test", "test@example.com")
+    return repo.index.commit(f"Update {file_name}", author=actor, committer=actor).hexsha
+
+
+def test_get_commit_diff_ignores_the_diff_config(tmp_path):
+    repo = git.Repo.init(tmp_path / "repo")
+    lines = [f"line {i}" for i in range(1, 31)]
+    commit_file(repo, "m.py", "\n".join(lines) + "\n")
+    lines[9] = "changed 10"
+    lines[19] = "changed 20"
+    commit_sha = commit_file(repo, "m.py", "\n".join(lines) + "\n")
+    with repo.config_writer() as config:
+        config.set_value("diff", "noprefix", "true")
+        config.set_value("diff", "mnemonicPrefix", "true")
+        config.set_value("diff", "context", "12")
+        config.set_value("diff", "interHunkContext", "10")
+
+    commit_diff = get_commit_diff(repo, commit_sha)
+
+    assert [file["filename"] for file in commit_diff["files"]] == ["m.py"]
+    # Two hunks with 3 lines of context, as GitHub shows them
+    assert commit_diff["files"][0]["patch"].startswith("@@ -7,7 +7,7 @@")
+    assert "\n@@ -17,7 +17,7 @@" in commit_diff["files"][0]["patch"]
+
+
+def test_parse_git_diff_keeps_the_new_path_of_renamed_and_quoted_files():
+    diff_output = (
+        'diff --git "a/old name.py" "b/new\\tname.py"\n'
+        'similarity index 80%\n'
+        'rename from old name.py\n'
+        'rename to "new\\tname.py"\n'
+        '--- "a/old name.py"\n'
+        '+++ "b/new\\tname.py"\n'
+        '@@ -1 +1 @@\n'
+        '-x = 1\n'
+        '+x = 2\n'
+    )
+
+    assert parse_git_diff(diff_output) == [{"filename": "new\tname.py", "patch": "@@ -1 +1 @@\n-x = 1\n+x = 2"}]
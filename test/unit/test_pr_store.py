@@ -0,0 +1,153 @@
+import pytest
+from pr_store import ApprovedPRStore, scan_approved_PRs, parse_page_cursor, to_page_cursor
+
+PAGE_SIZE = 2
+
+
+class ClosedPRs:
+    """
+    The closed PRs listing, most recently updated first, served page by page with REST page cursors.
+    """
+    def __init__(self, prs: list):
+        self.prs = prs
+        self.cursors = []
+        self.fail_at = None
+
+    def update(self, number: int, updated_at: float, approved: bool):
+        self.prs = [pr for pr in self.prs if pr["number"] != number]
+        self.prs.append(make_pr(number, updated_at, approved))
+
+    def fetch_page(self, cursor):
+        self.cursors.append(cursor)
+        page_number = parse_page_cursor(cursor, PAGE_SIZE)
+        if page_number == self.fail_at:
+            raise ConnectionError("interrupted")
+
+        prs = sorted(self.prs, key=lambda pr: pr["updated_at"], reverse=True)
+        pr_records = prs[page_number * PAGE_SIZE:(page_number + 1) * PAGE_SIZE]
+        updated_ats = [pr_record["updated_at"] for pr_record in pr_records]
+        next_cursor = to_page_cursor(page_number + 1, PAGE_SIZE) if (page_number + 1) * PAGE_SIZE < len(prs) else None
+        return pr_records, min(updated_ats, default=None), max(updated_ats, default=None), next_cursor
+
+
+def make_pr(number: int, updated_at: float, approved: bool) -> dict:
+    return {
+        "number": number,
+        "updated_at": updated_at,
+        "title": f"PR {number}",
+        "base_repo": "owner/project",
+        "head_sha": f"{number:040x}",
+        "approved": approved,
+        "review_comments": None,
+        "commits": None,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ApprovedPRStore(str(tmp_path / "approved_pr_records.sqlite"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def closed_prs():
+    # PR n was last updated at 100 * n, every other PR is approved
+    return ClosedPRs([make_pr(number, 100.0 * number, approved=number % 2 == 0) for number in range(1, 8)])
+
+
+def test_scan_saves_the_approved_prs_and_the_high_watermark(store, closed_prs):
+    approved_prs = scan_approved_PRs(store, closed_prs.fetch_page)
+
+    assert [pr["number"] for pr in approved_prs] == [6, 4, 2]
+    assert approved_prs[0] == make_pr(6, 600.0, approved=True)
+    assert closed_prs.cursors == [None, "1/2", "2/2", "3/2"]
+    assert store.get_state("high_watermark") == "700.0"
+    assert store.get_state("scan_watermark") is None
+    assert store.get_state("scan_cursor") is None
+
+
+def test_interrupted_scan_resumes_from_the_saved_cursor(store, closed_prs):
+    closed_prs.fail_at = 2
+    with pytest.raises(ConnectionError):
+        scan_approved_PRs(store, closed_prs.fetch_page)
+    assert store.get_state("scan_cursor") == "2/2"
+    assert store.get_state("scan_watermark") == "700.0"
+    assert store.get_state("high_watermark") is None
+
+    closed_prs.fail_at = None
+    closed_prs.cursors = []
+    approved_prs = scan_approved_PRs(store, closed_prs.fetch_page)
+
+    # The pages saved before the interruption are not requested again
+    assert closed_prs.cursors == ["2/2", "3/2"]
+    assert [pr["number"] for pr in approved_prs] == [6, 4, 2]
+    assert store.get_state("high_watermark") == "700.0"
+    assert store.get_state("scan_cursor") is None
+
+
+def test_resumed_scan_keeps_the_watermark_of_its_first_page(store, closed_prs):
+    closed_prs.fail_at = 1
+    with pytest.raises(ConnectionError):
+        scan_approved_PRs(store, closed_prs.fetch_page)
+
+    # Updated while the scan was interrupted, it moves to the first page, which the resumed scan does not request
+    closed_prs.update(3, 800.0, approved=True)
+    closed_prs.fail_at = None
+    scan_approved_PRs(store, closed_prs.fetch_page)
+    assert store.get_state("high_watermark") == "700.0"
+
+    # So the next scan still covers it
+    closed_prs.cursors = []
+    approved_prs = scan_approved_PRs(store, closed_prs.fetch_page)
+    assert closed_prs.cursors == [None]
+    assert 3 in [pr["number"] for pr in approved_prs]
+    assert store.get_state("high_watermark") == "800.0"
+
+
+def test_later_scan_stops_at_the_high_watermark(store, closed_prs):
+    scan_approved_PRs(store, closed_prs.fetch_page)
+
+    closed_prs.update(8, 900.0, approved=True)
+    closed_prs.update(9, 1000.0, approved=False)
+    closed_prs.update(5, 950.0, approved=True)
+    closed_prs.cursors = []
+    approved_prs = scan_approved_PRs(store, closed_prs.fetch_page)
+
+    # Page 1 holds PRs 8 and 7, and PR 7 was covered by the previous scan
+    assert closed_prs.cursors == [None, "1/2"]
+    assert [pr["number"] for pr in approved_prs] == [8, 6, 5, 4, 2]
+    assert approved_prs[2]["updated_at"] == 950.0
+    assert store.get_state("high_watermark") == "1000.0"
+
+
+def test_scan_without_updates_requests_one_page(store, closed_prs):
+    scan_approved_PRs(store, closed_prs.fetch_page)
+
+    closed_prs.cursors = []
+    approved_prs = scan_approved_PRs(store, closed_prs.fetch_page)
+
+    assert closed_prs.cursors == [None]
+    assert len(approved_prs) == 3
+    assert store.get_state("high_watermark") == "700.0"
+
+
+def test_scan_of_a_repository_without_closed_prs(store):
+    closed_prs = ClosedPRs([])
+
+    assert len(scan_approved_PRs(store, closed_prs.fetch_page)) == 0
+    assert store.get_state("high_watermark") is None
+    assert store.get_state("scan_cursor") is None
+
+
+@pytest.mark.parametrize("cursor, page_size, page_number", [
+    (None, 100, 0),
+    ("3/100", 100, 3),
+    # Saved with another page size: the page holding its first PR
+    ("3/30", 100, 0),
+    ("7/30", 100, 2),
+    # A bare page number was saved with PyGithub's page size of 30
+    ("4", 100, 1),
+])
+def test_parse_page_cursor(cursor, page_size, page_number):
+    assert parse_page_cursor(cursor, page_size) == page_number
@@ -0,0 +1,106 @@
+import os
+import git
+import pytest
+import constants
+from repo_cache import get_cache_path, update_repo_cache, checkout_worktree, fetch_pull_request_refs
+
+REPO_NAME = "owner/project"
+
+
+def commit_files(repo: git.Repo, files: dict, message: str) -> str:
+    for file_name, content in files.items():
+        file_path = os.path.join(repo.working_tree_dir, file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as file:
+            file.write(content)
+    repo.index.add(list(files))
+    actor = git.Actor("Test", "test@example.com")
+    return repo.index.commit(message, author=actor, committer=actor).hexsha
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """
+    A repository and the bare remote it is pushed to, served to repo_cache through GIT_REMOTE_URL.
+    """
+    repo = git.Repo.init(tmp_path / "upstream")
+    repo.git.symbolic_ref("HEAD", "refs/heads/main")
+    commit_files(repo, {"src/module.py": "def f():\n    return 1\n", "docs/notes.md": "notes\n"}, "Initial commit")
+    remotes_dir = tmp_path / "remotes"
+    remote = git.Repo.clone_from(repo.working_tree_dir, remotes_dir / f"{REPO_NAME}.git", bare=True)
+    repo.create_remote("origin", remote.git_dir)
+
+    monkeypatch.setattr(constants, "GIT_REMOTE_URL", f"file://{remotes_dir}/{{repo_name}}.git")
+    monkeypatch.setattr(constants, "REPO_CACHE_DIR", str(tmp_path / "repo_cache"))
+    return repo
+
+
+def test_update_repo_cache_clones_a_bare_partial_clone(upstream):
+    bare_repo = update_repo_cache(REPO_NAME)
+
+    assert bare_repo.bare
+    assert os.path.samefile(bare_repo.git_dir, get_cache_path(REPO_NAME))
+    assert bare_repo.commit("main").hexsha == upstream.head.commit.hexsha
+    assert bare_repo.git.config("remote.origin.partialclonefilter") == "blob:none"
+
+
+def test_update_repo_cache_reuses_the_clone_and_fetches_new_commits(upstream):
+    first_clone = update_repo_cache(REPO_NAME)
+    # Left in the cache by the first run, a new clone would not have it
+    marker_path = os.path.join(first_clone.git_dir, "marker")
+    open(marker_path, 'w').close()
+    new_sha = commit_files(upstream, {"src/module.py": "def f():\n    return 2\n"}, "Change f")
+    upstream.git.push("origin", "main")
+
+    bare_repo = update_repo_cache(REPO_NAME)
+
+    assert os.path.exists(marker_path)
+    assert bare_repo.commit("main").hexsha == new_sha
+
+
+def test_update_repo_cache_follows_a_new_remote_url(upstream, tmp_path, monkeypatch):
+    update_repo_cache(REPO_NAME)
+    mirror_dir = tmp_path / "mirror"
+    git.Repo.clone_from(upstream.working_tree_dir, mirror_dir / f"{REPO_NAME}.git", bare=True)
+    monkeypatch.setattr(constants, "GIT_REMOTE_URL", f"file://{mirror_dir}/{{repo_name}}.git")
+
+    bare_repo = update_repo_cache(REPO_NAME)
+
+    assert bare_repo.remote("origin").url == f"file://{mirror_dir}/{REPO_NAME}.git"
+
+
+def test_checkout_worktree_only_writes_source_files_and_is_reused(upstream, tmp_path):
+    bare_repo = update_repo_cache(REPO_NAME)
+    worktree_path = str(tmp_path / "worktree")
+
+    worktree = checkout_worktree(bare_repo, worktree_path)
+
+    assert worktree.head.commit.hexsha == upstream.head.commit.hexsha
+    assert os.path.exists(os.path.join(worktree_path, "src", "module.py"))
+    assert not os.path.exists(os.path.join(worktree_path, "docs", "notes.md"))
+
+    new_sha = commit_files(upstream, {"src/module.py": "def f():\n    return 2\n"}, "Change f")
+    upstream.git.push("origin", "main")
+    untracked_path = os.path.join(worktree_path, "untracked.txt")
+    open(untracked_path, 'w').close()
+
+    worktree = checkout_worktree(update_repo_cache(REPO_NAME), worktree_path)
+
+    # Moved to the new commit in place, not checked out again
+    assert os.path.exists(untracked_path)
+    assert worktree.head.commit.hexsha == new_sha
+    with open(os.path.join(worktree_path, "src", "module.py")) as module_file:
+        assert "return 2" in module_file.read()
+
+
+def test_fetch_pull_request_refs_skips_missing_refs(upstream):
+    pr_sha = commit_files(upstream, {"src/feature.py": "def g():\n    return 3\n"}, "Add g")
+    # The commit of the PR is on no branch of the remote, only on its pull ref
+    upstream.git.push("origin", f"{pr_sha}:refs/pull/1/head")
+    upstream.git.reset("--hard", "HEAD~1")
+    bare_repo = update_repo_cache(REPO_NAME)
+
+    fetch_pull_request_refs(bare_repo, [1, 2])
+
+    assert bare_repo.commit("refs/pull/1/head").hexsha == pr_sha
+    assert "refs/pull/2/head" not in [ref.path for ref in bare_repo.refs]
@@ -0,0 +1,31 @@
+import pytest
+from user_defined_functions import extract_user_defined_function_spans
+
+C_SOURCE = b"""static char *foo(int a) { return 0; }
+int **bar(void) { return 0; }
+char * const *split(const char *s, char c) { return 0; }
+int (*get_handler(void))(int) { return 0; }
+int plain(void) { return 1; }
+"""
+
+CPP_SOURCE = b"""int **bar(void) { return 0; }
+const std::string &Widget::name() const { return name_; }
+void outer::inner::deep() {}
+Widget::~Widget() {}
+bool operator==(Widget a, Widget b) { return true; }
+class Widget { int *size() { return 0; } };
+"""
+
+
+@pytest.mark.parametrize("source, file_path, names", [
+    (C_SOURCE, "src/module.c", ["foo", "bar", "split", "get_handler", "plain"]),
+    # Destructors and operators cannot be called by name
+    (CPP_SOURCE, "src/module.cpp", ["bar", "name", "deep", "size"]),
+])
+def test_functions_under_declarator_chains_are_extracted(source, file_path, names):
+    function_spans = extract_user_defined_function_spans(source, file_path)
+
+    assert [name for name, *_ in function_spans] == names
+    for name, start_line, end_line, start_byte, end_byte in function_spans:
+        assert name.encode('utf-8') in source[start_byte:end_byte]
+        assert start_line == end_line